@@ -3,7 +3,8 @@ Application configuration using Pydantic Settings.
 Loads environment variables from .env file.
 """
 
-from pydantic_settings import BaseSettings
+from typing import List
+from pydantic_settings import BaseSettings, SettingsConfigDict
 from functools import lru_cache
 
 
@@ -12,6 +13,11 @@ class Settings(BaseSettings):
     
     # MongoDB
     mongodb_uri: str = ""
+    # Totals under run.py, which splits them across its workers; plain
+    # uvicorn (Procfile, nixpacks.toml) applies them to each process as-is
+    mongodb_max_pool_size: int = 0  # 0 = size from CPU count
+    mongodb_min_pool_size: int = 10
+    skip_index_init: bool = False  # True when indexes are built at deploy time
     
     # Firecrawl
     firecrawl_api_key: str = ""
@@ -20,13 +26,21 @@ class Settings(BaseSettings):
     resend_api_key: str = ""
     resend_from_email: str = "onboarding@resend.dev"
     
+    # Redis (optional hot cache; disabled when empty)
+    redis_url: str = ""
+    
     # Server
     port: int = 8000
     debug: bool = True
+    workers: int = 0  # 0 = one per CPU (always 1 in debug, which uses reload)
+    
+    # CORS (only applied when debug is off; debug allows any origin)
+    cors_origins: List[str] = []
     
-    class Config:
-        env_file = ".env"
-        env_file_encoding = "utf-8"
+    model_config = SettingsConfigDict(
+        env_file=".env",
+        env_file_encoding="utf-8",
+    )
 
 
 @lru_cache()
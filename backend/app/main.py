@@ -4,15 +4,28 @@ MatchPoint - FastAPI Backend
 Main application entry point.
 """
 
+import asyncio
+import logging
+import sys
+import time
 from contextlib import asynccontextmanager
+from datetime import datetime
+
+import orjson
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response
 
 from .config import get_settings
-from .services.mongodb import connect_mongodb, close_mongodb
-from .services.firecrawl import init_firecrawl
+from .responses import MongoJSONResponse
+from .services.mongodb import connect_mongodb, close_mongodb, warm_mongodb_pool
+from .services.firecrawl import init_firecrawl, close_firecrawl
+from .services.cache import init_cache, close_cache, get_cache_stats
+from .services.clinicaltrials import close_client
 from .routes import trials, patients, matches
 
+logger = logging.getLogger(__name__)
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -22,33 +35,57 @@ async def lifespan(app: FastAPI):
     """
     settings = get_settings()
     
-    print("\n🏥 MatchPoint Backend")
-    print("═" * 50)
+    # Publish hot settings as plain attributes for per-request readers
+    app.state.resend_api_key = settings.resend_api_key
+    app.state.resend_from_email = settings.resend_from_email
+    
+    # Surface the event loop in use so a fallback to the pure-Python loop is visible
+    loop = asyncio.get_running_loop()
     
     # Startup
     try:
         # Connect to MongoDB
         if not settings.mongodb_uri:
-            print("⚠️  MONGODB_URI not set - database features disabled")
+            logger.warning("MONGODB_URI not set - database features disabled")
         else:
-            await connect_mongodb(settings.mongodb_uri)
+            await connect_mongodb(
+                settings.mongodb_uri,
+                max_pool_size=settings.mongodb_max_pool_size or None,
+                min_pool_size=settings.mongodb_min_pool_size,
+                init_indexes=not settings.skip_index_init
+            )
+            await warm_mongodb_pool()
         
         # Initialize Firecrawl
         if settings.firecrawl_api_key:
             init_firecrawl(settings.firecrawl_api_key)
         else:
-            print("⚠️  FIRECRAWL_API_KEY not set - enrichment disabled")
+            logger.warning("FIRECRAWL_API_KEY not set - enrichment disabled")
         
-        print(f"\n🚀 Server ready!")
-        print(f"📚 API docs: http://localhost:{settings.port}/docs\n")
+        # Connect to Redis (optional hot cache)
+        if settings.redis_url:
+            await init_cache(settings.redis_url)
         
     except Exception as e:
-        print(f"❌ Startup error: {e}")
+        logger.error(f"❌ Startup error: {e}")
         raise
     
+    # Banner goes out in a single write
+    sys.stdout.write(
+        "\n🏥 MatchPoint Backend\n"
+        + "═" * 50
+        + f"\n🔁 Event loop: {type(loop).__module__}.{type(loop).__name__}"
+        + "\n🚀 Server ready!"
+        + f"\n📚 API docs: http://localhost:{settings.port}/docs\n\n"
+    )
+    sys.stdout.flush()
+    
     yield
     
     # Shutdown
+    await close_client()
+    await close_firecrawl()
+    await close_cache()
     await close_mongodb()
 
 
@@ -57,17 +94,28 @@ app = FastAPI(
     title="MatchPoint API",
     description="Backend API for matching patients with clinical trials",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=MongoJSONResponse
 )
 
-# CORS middleware
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],  # Configure appropriately for production
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+# CORS middleware: wide open in debug, explicit origins in production
+if get_settings().debug:
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+else:
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=get_settings().cors_origins,
+        allow_credentials=True,
+        allow_methods=["GET", "POST", "PUT", "DELETE"],
+        allow_headers=["content-type", "authorization"],
+        max_age=86400,
+    )
 
 # Include routers
 app.include_router(trials.router)
@@ -75,48 +123,71 @@ app.include_router(patients.router)
 app.include_router(matches.router)
 
 
+# Constant payloads are serialized once at import and may be cached by clients
+_STATIC_HEADERS = {"Cache-Control": "public, max-age=3600"}
+
+_ROOT_BYTES = orjson.dumps({
+    "name": "MatchPoint API",
+    "version": "1.0.0",
+    "docs": "/docs",
+    "health": "/health"
+})
+
+_API_INFO_BYTES = orjson.dumps({
+    "name": "MatchPoint API",
+    "version": "1.0.0",
+    "endpoints": {
+        "trials": {
+            "GET /api/trials": "List all trials (query: condition, status, limit)",
+            "GET /api/trials/{nct_id}": "Get trial by NCT ID",
+            "POST /api/trials/batch": "Get several trials by NCT ID (body: nct_ids)",
+            "GET /api/trials/{nct_id}/markdown": "Get trial markdown content",
+            "POST /api/trials/crawl": "Trigger crawl job (body: condition, max_trials)",
+            "GET /api/trials/filesystem/{condition}": "Get trials as filesystem for agent"
+        },
+        "patients": {
+            "GET /api/patients": "List all patients",
+            "GET /api/patients/{id}": "Get patient by ID",
+            "POST /api/patients": "Create patient (simple profile)",
+            "POST /api/patients/import": "Create patient with full clinical profile",
+            "PUT /api/patients/{id}": "Update patient",
+            "DELETE /api/patients/{id}": "Delete patient"
+        }
+    }
+})
+
+
 @app.get("/")
 async def root():
     """Root endpoint with API info."""
-    return {
-        "name": "MatchPoint API",
-        "version": "1.0.0",
-        "docs": "/docs",
-        "health": "/health"
-    }
+    return Response(content=_ROOT_BYTES, media_type="application/json", headers=_STATIC_HEADERS)
+
+
+# /health body, re-encoded at most once per second: [epoch second, bytes]
+_health_cache = [0, b""]
+
+
+def _health_body() -> bytes:
+    """Return the /health payload, reusing the encoding within the same second."""
+    second = int(time.time())
+    if second != _health_cache[0]:
+        _health_cache[0] = second
+        _health_cache[1] = orjson.dumps({
+            "status": "ok",
+            "timestamp": datetime.utcnow(),
+            "service": "matchpoint-backend",
+            "cache": get_cache_stats()
+        })
+    return _health_cache[1]
 
 
 @app.get("/health")
 async def health_check():
     """Health check endpoint."""
-    from datetime import datetime
-    return {
-        "status": "ok",
-        "timestamp": datetime.utcnow().isoformat(),
-        "service": "matchpoint-backend"
-    }
+    return Response(content=_health_body(), media_type="application/json")
 
 
 @app.get("/api")
 async def api_info():
     """API documentation endpoint."""
-    return {
-        "name": "MatchPoint API",
-        "version": "1.0.0",
-        "endpoints": {
-            "trials": {
-                "GET /api/trials": "List all trials (query: condition, status, limit)",
-                "GET /api/trials/{nct_id}": "Get trial by NCT ID",
-                "GET /api/trials/{nct_id}/markdown": "Get trial markdown content",
-                "POST /api/trials/crawl": "Trigger crawl job (body: condition, max_trials)",
-                "GET /api/trials/filesystem/{condition}": "Get trials as filesystem for agent"
-            },
-            "patients": {
-                "GET /api/patients": "List all patients",
-                "GET /api/patients/{id}": "Get patient by ID",
-                "POST /api/patients": "Create patient",
-                "PUT /api/patients/{id}": "Update patient",
-                "DELETE /api/patients/{id}": "Delete patient"
-            }
-        }
-    }
+    return Response(content=_API_INFO_BYTES, media_type="application/json", headers=_STATIC_HEADERS)
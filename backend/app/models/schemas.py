@@ -2,9 +2,48 @@
 Pydantic schemas for request/response validation.
 """
 
-from typing import Optional, List, Dict, Any
+import re
+from typing import Optional, List, Dict, Any, Literal
 from datetime import datetime, date
-from pydantic import BaseModel, Field, EmailStr
+import fastjsonschema
+from pydantic import (
+    BaseModel,
+    ConfigDict,
+    Field,
+    computed_field,
+    field_validator,
+    model_validator,
+)
+
+from .schemas_clinical import (
+    DiseaseActivity,
+    PatientLabs,
+    PatientVitals,
+    TreatmentHistory,
+    ExclusionCriteria,
+)
+
+
+# Closed value sets, validated by pydantic-core as literal set membership
+Sex = Literal["M", "F", "other"]
+Severity = Literal["mild", "moderate", "severe"]
+DataSource = Literal["synthea", "manual", "ehr_import"]
+
+# Deliberately loose: one @, no whitespace, a dot in the domain
+_EMAIL_PATTERN = r"^[^@\s]+@[^@\s]+\.[^@\s]+$"
+_EMAIL_RE = re.compile(_EMAIL_PATTERN)
+
+
+def _check_email(value: Optional[str]) -> Optional[str]:
+    """Validate an optional email address against _EMAIL_RE."""
+    if value and not _EMAIL_RE.match(value):
+        raise ValueError("value is not a valid email address")
+    return value
+
+
+# Response DTOs are built once and serialized, never mutated. Extra fields
+# from older stored documents are ignored.
+_RESPONSE_CONFIG = ConfigDict(frozen=True, populate_by_name=True, extra="ignore")
 
 
 # ============ Patient Sub-Schemas (for extended patient model) ============
@@ -20,86 +59,12 @@ class PatientLocation(BaseModel):
 
 class PrimaryDiagnosis(BaseModel):
     """Primary diagnosis with coding."""
-    condition: str = Field(..., description="Human-readable condition name")
+    condition: str = Field(..., min_length=1, description="Human-readable condition name")
     snomed_code: Optional[str] = Field(default=None, description="SNOMED-CT code")
     diagnosis_date: Optional[str] = Field(default=None, description="Date of diagnosis (YYYY-MM-DD)")
     years_since_diagnosis: Optional[float] = Field(default=None, description="Years since diagnosis")
 
 
-class DiseaseActivity(BaseModel):
-    """Disease activity scores (for autoimmune conditions like RA)."""
-    das28: Optional[float] = Field(default=None, description="Disease Activity Score 28")
-    cdai: Optional[float] = Field(default=None, description="Clinical Disease Activity Index")
-    sdai: Optional[float] = Field(default=None, description="Simplified Disease Activity Index")
-    disease_severity: Optional[str] = Field(default=None, description="mild, moderate, moderate-severe, severe")
-    last_assessed: Optional[str] = Field(default=None, description="Date of last assessment")
-
-
-class PatientLabs(BaseModel):
-    """Laboratory values for eligibility matching."""
-    # Disease-specific markers (flags)
-    rf_positive: Optional[bool] = Field(default=None, description="Rheumatoid Factor positive")
-    anti_ccp_positive: Optional[bool] = Field(default=None, description="Anti-CCP antibodies positive")
-    ana_positive: Optional[bool] = Field(default=None, description="ANA positive (for lupus)")
-    
-    # Inflammatory markers
-    esr: Optional[float] = Field(default=None, description="ESR mm/hr")
-    crp: Optional[float] = Field(default=None, description="CRP mg/L")
-    
-    # Organ function
-    egfr: Optional[float] = Field(default=None, description="eGFR mL/min (kidney function)")
-    alt: Optional[float] = Field(default=None, description="ALT U/L (liver)")
-    ast: Optional[float] = Field(default=None, description="AST U/L (liver)")
-    
-    # Blood counts
-    hemoglobin: Optional[float] = Field(default=None, description="Hemoglobin g/dL")
-    wbc: Optional[float] = Field(default=None, description="WBC x10^9/L")
-    platelets: Optional[float] = Field(default=None, description="Platelets x10^9/L")
-    
-    last_updated: Optional[str] = None
-
-
-class PatientVitals(BaseModel):
-    """Vital signs for eligibility matching."""
-    height_cm: Optional[float] = None
-    weight_kg: Optional[float] = None
-    bmi: Optional[float] = None
-    blood_pressure_systolic: Optional[int] = None
-    blood_pressure_diastolic: Optional[int] = None
-    last_updated: Optional[str] = None
-
-
-class CurrentMedication(BaseModel):
-    """A current medication."""
-    name: str
-    dose: Optional[str] = None
-    rxnorm_code: Optional[str] = None
-    start_date: Optional[str] = None
-    reason: Optional[str] = None
-
-
-class TreatmentHistory(BaseModel):
-    """Treatment history organized for trial matching."""
-    # DMARDs (Disease-Modifying Antirheumatic Drugs)
-    conventional_dmards: List[str] = Field(default=[], description="e.g., methotrexate, sulfasalazine")
-    conventional_dmards_failed: int = Field(default=0, description="Number of cDMARDs failed")
-    
-    # Biologics
-    biologics: List[str] = Field(default=[], description="e.g., adalimumab, etanercept")
-    biologics_failed: int = Field(default=0, description="Number of biologics failed")
-    
-    # JAK inhibitors
-    jak_inhibitors: List[str] = Field(default=[], description="e.g., tofacitinib, baricitinib")
-    jak_inhibitors_failed: int = Field(default=0, description="Number of JAK inhibitors failed")
-    
-    # Current medications
-    current_medications: List[CurrentMedication] = Field(default=[])
-    
-    # Summary fields
-    total_failed_therapies: int = Field(default=0)
-    biologic_naive: bool = Field(default=True, description="Never received biologics")
-
-
 class Condition(BaseModel):
     """A medical condition."""
     name: str
@@ -109,25 +74,11 @@ class Condition(BaseModel):
     is_primary: bool = False
 
 
-class ExclusionCriteria(BaseModel):
-    """Common trial exclusion criteria."""
-    pregnancy_status: str = Field(default="unknown", description="not_pregnant, pregnant, unknown")
-    nursing: bool = False
-    recent_infections: bool = False
-    active_malignancy: bool = False
-    hiv_positive: bool = False
-    hepatitis_b: bool = False
-    hepatitis_c: bool = False
-    tb_history: bool = False
-    recent_live_vaccine: bool = Field(default=False, description="Within 4-6 weeks")
-    recent_surgery: bool = Field(default=False, description="Within 4 weeks")
-
-
 class Allergy(BaseModel):
     """An allergy."""
     allergen: str
     snomed_code: Optional[str] = None
-    severity: Optional[str] = Field(default=None, description="mild, moderate, severe")
+    severity: Optional[Severity] = Field(default=None, description="mild, moderate, severe")
     reaction: Optional[str] = None
 
 
@@ -142,8 +93,13 @@ class PatientPreferences(BaseModel):
 class ProviderInfo(BaseModel):
     """Provider/doctor information."""
     name: Optional[str] = None
-    email: Optional[EmailStr] = None
+    email: Optional[str] = None
     npi: Optional[str] = None
+    
+    @field_validator("email", mode="after")
+    @classmethod
+    def _validate_email(cls, value: Optional[str]) -> Optional[str]:
+        return _check_email(value)
 
 
 # ============ Trial Schemas ============
@@ -197,6 +153,8 @@ class TrialResponse(BaseModel):
     markdown_content: Optional[str] = None
     created_at: Optional[datetime] = None
     updated_at: Optional[datetime] = None
+    
+    model_config = _RESPONSE_CONFIG
 
 
 class TrialListResponse(BaseModel):
@@ -204,6 +162,8 @@ class TrialListResponse(BaseModel):
     success: bool = True
     count: int
     trials: List[Dict[str, Any]]
+    
+    model_config = _RESPONSE_CONFIG
 
 
 class CrawlRequest(BaseModel):
@@ -218,6 +178,23 @@ class CrawlResponse(BaseModel):
     """Response from crawl job."""
     success: bool = True
     stats: Dict[str, Any]
+    
+    model_config = _RESPONSE_CONFIG
+
+
+class BatchTrialsRequest(BaseModel):
+    """Request to fetch several trials by NCT ID in one call."""
+    nct_ids: List[str] = Field(..., min_length=1, max_length=100, description="NCT IDs to fetch")
+
+
+class BatchTrialsResponse(BaseModel):
+    """Trials keyed by NCT ID; IDs not found are listed separately."""
+    success: bool = True
+    count: int
+    trials: Dict[str, TrialResponse]
+    missing: List[str] = []
+    
+    model_config = _RESPONSE_CONFIG
 
 
 class FilesystemResponse(BaseModel):
@@ -226,6 +203,8 @@ class FilesystemResponse(BaseModel):
     condition: str
     trial_count: int
     filesystem: Dict[str, str]
+    
+    model_config = _RESPONSE_CONFIG
 
 
 class BulkCrawlRequest(BaseModel):
@@ -248,6 +227,12 @@ class BulkCrawlRequest(BaseModel):
         default=False, 
         description="Force re-crawl even if trials exist in crawl index"
     )
+    max_concurrency: int = Field(
+        default=4,
+        ge=1,
+        le=16,
+        description="Maximum number of conditions crawled at the same time"
+    )
 
 
 class BulkCrawlConditionResult(BaseModel):
@@ -258,6 +243,8 @@ class BulkCrawlConditionResult(BaseModel):
     updated: int
     skipped: int
     error: Optional[str] = None
+    
+    model_config = _RESPONSE_CONFIG
 
 
 class BulkCrawlResponse(BaseModel):
@@ -266,34 +253,96 @@ class BulkCrawlResponse(BaseModel):
     conditions_crawled: List[str]
     summary: Dict[str, int]
     details: List[BulkCrawlConditionResult]
+    
+    model_config = _RESPONSE_CONFIG
 
 
 # ============ Patient Schemas ============
 
-class PatientCreate(BaseModel):
+class PatientCreateSimple(BaseModel):
+    """
+    Minimal schema for the quick-add path (POST /api/patients).
+    Only the original flat patient fields, so the validator stays small.
+    
+    Every constraint is expressible in JSON Schema (emails use `pattern`),
+    so validate_patient_simple below accepts exactly the same payloads.
+    Unknown keys are rejected rather than dropped, so clinical fields sent
+    here fail loudly instead of being lost (they belong on /import).
+    """
+    model_config = ConfigDict(extra="forbid")
+    
+    name: str = Field(..., min_length=1, description="Patient name")
+    email: Optional[str] = Field(default=None, pattern=_EMAIL_PATTERN, description="Patient email")
+    age: Optional[int] = Field(default=None, ge=0, le=150, description="Patient age")
+    location: Optional[str] = Field(default=None, description="Patient location (city, state)")
+    condition: str = Field(..., min_length=1, description="Primary condition")
+    prior_treatments: List[str] = Field(default=[], description="Previous treatments")
+    comorbidities: List[str] = Field(default=[], description="Other conditions")
+    budget_constraints: Optional[str] = Field(default=None, description="Budget constraints")
+    time_commitment: Optional[str] = Field(default=None, description="Available time commitment")
+    doctor_name: Optional[str] = Field(default=None, description="Doctor's name")
+    doctor_email: Optional[str] = Field(default=None, pattern=_EMAIL_PATTERN, description="Doctor's email")
+
+
+_check_patient_simple = fastjsonschema.compile(PatientCreateSimple.model_json_schema())
+
+# JSON Schema `integer` also matches integral floats such as 5.0
+_SIMPLE_INT_FIELDS = tuple(
+    name for name, field in PatientCreateSimple.model_fields.items()
+    if field.annotation in (int, Optional[int])
+)
+
+
+def validate_patient_simple(body: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Compiled JSON Schema check for the hot POST /api/patients body.
+    
+    Integral floats in integer fields are converted to int, as
+    PatientCreateSimple.model_validate would, so the result can go straight
+    to PatientCreateSimple.model_construct.
+    
+    Args:
+        body: Decoded request body
+        
+    Returns:
+        The body with defaults filled in and integer fields converted
+        
+    Raises:
+        fastjsonschema.JsonSchemaException: If the body is invalid
     """
-    Extended schema for creating a patient with full clinical data.
-    Supports both simple (backward-compatible) and detailed patient profiles.
+    data = _check_patient_simple(body)
+    for name in _SIMPLE_INT_FIELDS:
+        if isinstance(data.get(name), float):
+            data[name] = int(data[name])
+    return data
+
+
+class PatientCreateExtended(BaseModel):
+    """
+    Extended schema for creating a patient with full clinical data
+    (POST /api/patients/import).
+    
+    The legacy flat fields (location, condition, doctor_name, doctor_email)
+    are accepted on input but folded into their structured counterparts, and
+    re-exposed as computed fields so stored documents keep the same shape.
     """
     # === Core identifiers ===
     name: str = Field(..., min_length=1, description="Patient name")
-    email: Optional[EmailStr] = Field(default=None, description="Patient email")
+    email: Optional[str] = Field(default=None, description="Patient email")
     synthea_id: Optional[str] = Field(default=None, description="Original Synthea UUID if imported")
     
     # === Demographics ===
     age: Optional[int] = Field(default=None, ge=0, le=150, description="Patient age")
     birth_date: Optional[str] = Field(default=None, description="Birth date (YYYY-MM-DD)")
-    sex: Optional[str] = Field(default=None, description="M, F, or other")
+    sex: Optional[Sex] = Field(default=None, description="M, F, or other")
     race: Optional[str] = None
     ethnicity: Optional[str] = None
     
     # === Location ===
-    location: Optional[str] = Field(default=None, description="Patient location (city, state) - backward compatible")
     location_details: Optional[PatientLocation] = Field(default=None, description="Structured location with lat/lon")
     
     # === Primary diagnosis ===
-    primary_diagnosis: Optional[PrimaryDiagnosis] = None
-    condition: str = Field(..., min_length=1, description="Primary condition (backward compatible)")
+    primary_diagnosis: PrimaryDiagnosis = Field(..., description="Primary condition (also accepted as flat `condition`)")
     
     # === Disease activity (for autoimmune conditions) ===
     disease_activity: Optional[DiseaseActivity] = None
@@ -327,21 +376,85 @@ class PatientCreate(BaseModel):
     
     # === Provider info ===
     provider: Optional[ProviderInfo] = None
-    doctor_name: Optional[str] = Field(default=None, description="Doctor's name (backward compatible)")
-    doctor_email: Optional[EmailStr] = Field(default=None, description="Doctor's email (backward compatible)")
     
     # === Metadata ===
-    data_source: str = Field(default="manual", description="synthea, manual, ehr_import")
+    data_source: DataSource = Field(default="manual", description="synthea, manual, ehr_import")
+    
+    @model_validator(mode="before")
+    @classmethod
+    def _migrate_legacy_fields(cls, data: Any) -> Any:
+        """Fold legacy flat keys into the structured fields they duplicate."""
+        if not isinstance(data, dict):
+            return data
+        data = dict(data)
+        
+        location = data.pop("location", None)
+        details = data.get("location_details") or {}
+        if location and isinstance(details, dict) and not (details.get("city") or details.get("state")):
+            city, sep, state = location.rpartition(",")
+            if not sep:
+                city, state = location, ""
+            data["location_details"] = {**details, "city": city.strip() or None, "state": state.strip() or None}
+        
+        condition = data.pop("condition", None)
+        if condition and not data.get("primary_diagnosis"):
+            data["primary_diagnosis"] = {"condition": condition}
+        
+        doctor_name = data.pop("doctor_name", None)
+        doctor_email = data.pop("doctor_email", None)
+        if doctor_name or doctor_email:
+            provider = data.get("provider") or {}
+            if isinstance(provider, dict):
+                provider = dict(provider)
+                if not provider.get("name"):
+                    provider["name"] = doctor_name
+                if not provider.get("email"):
+                    provider["email"] = doctor_email
+                data["provider"] = provider
+        
+        return data
+    
+    @field_validator("email", mode="after")
+    @classmethod
+    def _validate_email(cls, value: Optional[str]) -> Optional[str]:
+        return _check_email(value)
+    
+    @computed_field
+    @property
+    def location(self) -> Optional[str]:
+        """Location as "city, state" (backward compatible)."""
+        if not self.location_details:
+            return None
+        parts = [p for p in (self.location_details.city, self.location_details.state) if p]
+        return ", ".join(parts) or None
+    
+    @computed_field
+    @property
+    def condition(self) -> str:
+        """Primary condition (backward compatible)."""
+        return self.primary_diagnosis.condition
+    
+    @computed_field
+    @property
+    def doctor_name(self) -> Optional[str]:
+        """Doctor's name (backward compatible)."""
+        return self.provider.name if self.provider else None
+    
+    @computed_field
+    @property
+    def doctor_email(self) -> Optional[str]:
+        """Doctor's email (backward compatible)."""
+        return self.provider.email if self.provider else None
 
 
 class PatientUpdate(BaseModel):
     """Schema for updating a patient (all fields optional)."""
     name: Optional[str] = None
-    email: Optional[EmailStr] = None
+    email: Optional[str] = None
     synthea_id: Optional[str] = None
     age: Optional[int] = Field(default=None, ge=0, le=150)
     birth_date: Optional[str] = None
-    sex: Optional[str] = None
+    sex: Optional[Sex] = None
     race: Optional[str] = None
     ethnicity: Optional[str] = None
     location: Optional[str] = None
@@ -364,8 +477,13 @@ class PatientUpdate(BaseModel):
     time_commitment: Optional[str] = None
     provider: Optional[ProviderInfo] = None
     doctor_name: Optional[str] = None
-    doctor_email: Optional[EmailStr] = None
-    data_source: Optional[str] = None
+    doctor_email: Optional[str] = None
+    data_source: Optional[DataSource] = None
+    
+    @field_validator("email", "doctor_email", mode="after")
+    @classmethod
+    def _validate_email(cls, value: Optional[str]) -> Optional[str]:
+        return _check_email(value)
 
 
 class PatientResponse(BaseModel):
@@ -430,9 +548,7 @@ class PatientResponse(BaseModel):
     created_at: Optional[datetime] = None
     updated_at: Optional[datetime] = None
     
-    class Config:
-        populate_by_name = True
-        extra = "ignore"  # Ignore extra fields from old data
+    model_config = _RESPONSE_CONFIG
 
 
 class PatientListResponse(BaseModel):
@@ -440,6 +556,8 @@ class PatientListResponse(BaseModel):
     success: bool = True
     count: int
     patients: List[Dict[str, Any]]
+    
+    model_config = _RESPONSE_CONFIG
 
 
 # ============ Match Schemas ============
@@ -455,8 +573,22 @@ class MatchResponse(BaseModel):
     status: str = "pending"
     created_at: Optional[datetime] = None
     
-    class Config:
-        populate_by_name = True
+    model_config = _RESPONSE_CONFIG
+
+
+class MatchItem(BaseModel):
+    """A single match result posted by the gateway."""
+    nct_id: str = Field(..., description="NCT trial ID")
+    trial_title: Optional[str] = None
+    match_score: int = Field(..., ge=0, le=100)
+    reasoning: Optional[str] = None
+
+
+class MatchesPayload(BaseModel):
+    """Request body for storing match results."""
+    patient_id: str = Field(..., description="Patient ID")
+    matches: List[MatchItem] = Field(..., max_length=10)
+    send_email: bool = Field(default=True, description="Send Resend email to doctor/patient")
 
 
 class MatchListResponse(BaseModel):
@@ -464,6 +596,8 @@ class MatchListResponse(BaseModel):
     success: bool = True
     count: int
     matches: List[Dict[str, Any]]
+    
+    model_config = _RESPONSE_CONFIG
 
 
 # ============ Generic Schemas ============
@@ -472,9 +606,14 @@ class ErrorResponse(BaseModel):
     """Error response schema."""
     success: bool = False
     error: str
+    
+    model_config = _RESPONSE_CONFIG
 
 
 class SuccessResponse(BaseModel):
     """Generic success response."""
     success: bool = True
     message: str
+    
+    model_config = _RESPONSE_CONFIG
+
@@ -0,0 +1,103 @@
+"""
+Clinical sub-schemas for the extended patient model.
+
+Disease activity, labs, vitals, treatment history and exclusion criteria.
+Kept apart from the core patient/trial schemas; import them from
+app.models.schemas as before.
+"""
+
+from typing import Optional, List, Literal
+from pydantic import BaseModel, Field
+
+
+# Closed value sets, validated by pydantic-core as literal set membership
+DiseaseSeverity = Literal["mild", "moderate", "moderate-severe", "severe"]
+PregnancyStatus = Literal["not_pregnant", "pregnant", "not_applicable", "unknown"]
+
+
+class DiseaseActivity(BaseModel):
+    """Disease activity scores (for autoimmune conditions like RA)."""
+    das28: Optional[float] = Field(default=None, description="Disease Activity Score 28")
+    cdai: Optional[float] = Field(default=None, description="Clinical Disease Activity Index")
+    sdai: Optional[float] = Field(default=None, description="Simplified Disease Activity Index")
+    disease_severity: Optional[DiseaseSeverity] = Field(default=None, description="mild, moderate, moderate-severe, severe")
+    last_assessed: Optional[str] = Field(default=None, description="Date of last assessment")
+
+
+class PatientLabs(BaseModel):
+    """Laboratory values for eligibility matching."""
+    # Disease-specific markers (flags)
+    rf_positive: Optional[bool] = Field(default=None, description="Rheumatoid Factor positive")
+    anti_ccp_positive: Optional[bool] = Field(default=None, description="Anti-CCP antibodies positive")
+    ana_positive: Optional[bool] = Field(default=None, description="ANA positive (for lupus)")
+    
+    # Inflammatory markers
+    esr: Optional[float] = Field(default=None, description="ESR mm/hr")
+    crp: Optional[float] = Field(default=None, description="CRP mg/L")
+    
+    # Organ function
+    egfr: Optional[float] = Field(default=None, description="eGFR mL/min (kidney function)")
+    alt: Optional[float] = Field(default=None, description="ALT U/L (liver)")
+    ast: Optional[float] = Field(default=None, description="AST U/L (liver)")
+    
+    # Blood counts
+    hemoglobin: Optional[float] = Field(default=None, description="Hemoglobin g/dL")
+    wbc: Optional[float] = Field(default=None, description="WBC x10^9/L")
+    platelets: Optional[float] = Field(default=None, description="Platelets x10^9/L")
+    
+    last_updated: Optional[str] = None
+
+
+class PatientVitals(BaseModel):
+    """Vital signs for eligibility matching."""
+    height_cm: Optional[float] = None
+    weight_kg: Optional[float] = None
+    bmi: Optional[float] = None
+    blood_pressure_systolic: Optional[int] = None
+    blood_pressure_diastolic: Optional[int] = None
+    last_updated: Optional[str] = None
+
+
+class CurrentMedication(BaseModel):
+    """A current medication."""
+    name: str
+    dose: Optional[str] = None
+    rxnorm_code: Optional[str] = None
+    start_date: Optional[str] = None
+    reason: Optional[str] = None
+
+
+class TreatmentHistory(BaseModel):
+    """Treatment history organized for trial matching."""
+    # DMARDs (Disease-Modifying Antirheumatic Drugs)
+    conventional_dmards: List[str] = Field(default=[], description="e.g., methotrexate, sulfasalazine")
+    conventional_dmards_failed: int = Field(default=0, description="Number of cDMARDs failed")
+    
+    # Biologics
+    biologics: List[str] = Field(default=[], description="e.g., adalimumab, etanercept")
+    biologics_failed: int = Field(default=0, description="Number of biologics failed")
+    
+    # JAK inhibitors
+    jak_inhibitors: List[str] = Field(default=[], description="e.g., tofacitinib, baricitinib")
+    jak_inhibitors_failed: int = Field(default=0, description="Number of JAK inhibitors failed")
+    
+    # Current medications
+    current_medications: List[CurrentMedication] = Field(default=[])
+    
+    # Summary fields
+    total_failed_therapies: int = Field(default=0)
+    biologic_naive: bool = Field(default=True, description="Never received biologics")
+
+
+class ExclusionCriteria(BaseModel):
+    """Common trial exclusion criteria."""
+    pregnancy_status: PregnancyStatus = Field(default="unknown", description="not_pregnant, pregnant, not_applicable, unknown")
+    nursing: bool = False
+    recent_infections: bool = False
+    active_malignancy: bool = False
+    hiv_positive: bool = False
+    hepatitis_b: bool = False
+    hepatitis_c: bool = False
+    tb_history: bool = False
+    recent_live_vaccine: bool = Field(default=False, description="Within 4-6 weeks")
+    recent_surgery: bool = Field(default=False, description="Within 4 weeks")
@@ -0,0 +1,44 @@
+"""
+JSON response helpers.
+
+Serializes MongoDB payloads straight to bytes with orjson, skipping
+FastAPI's jsonable_encoder pass.
+"""
+
+from typing import Any
+
+import orjson
+from bson import ObjectId
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+
+def _default(obj: Any) -> Any:
+    """Serialize types orjson does not handle natively."""
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    if isinstance(obj, BaseModel):
+        return obj.model_dump()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+class MongoJSONResponse(JSONResponse):
+    """
+    JSON response rendered with orjson, aware of Mongo types.
+
+    ObjectId becomes a string, naive datetimes are emitted as UTC and
+    NaN/Infinity become null. Used as the app-wide default response class.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NAIVE_UTC)
+
+
+def orjson_response(payload: Any, status_code: int = 200) -> MongoJSONResponse:
+    """
+    Build a JSON response from a payload that may contain Mongo types.
+
+    Returning the response directly skips FastAPI's jsonable_encoder pass,
+    so documents can be returned as-is.
+    """
+    return MongoJSONResponse(payload, status_code=status_code)
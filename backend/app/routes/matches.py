@@ -2,13 +2,17 @@
 Matches API: store match results from the TypeScript gateway and send Resend email.
 """
 
+import asyncio
 import logging
-from fastapi import APIRouter, HTTPException, Query
-from pydantic import BaseModel, Field
-from typing import List, Optional
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Query, Request
+from typing import Optional
 
+from app.config import get_settings
 from app.services.mongodb import get_db, save_matches, get_patient_by_id, get_all_matches, get_matches_by_patient, get_cached_matches
 from app.services.email import send_match_notification
+from app.services.cache import cache_key, cache_get_json, cache_set_json, cache_delete
+from app.models.schemas import MatchListResponse, MatchesPayload
+from app.responses import orjson_response
 
 logger = logging.getLogger(__name__)
 
@@ -28,6 +32,11 @@ async def get_patient_cached_matches(patient_id: str):
     except RuntimeError:
         raise HTTPException(status_code=503, detail="Database unavailable")
     
+    key = cache_key("cm", patient_id)
+    payload = await cache_get_json(key)
+    if payload is not None:
+        return payload
+    
     cached = await get_cached_matches(patient_id)
     
     if not cached:
@@ -43,28 +52,18 @@ async def get_patient_cached_matches(patient_id: str):
     if updated_at:
         updated_at = updated_at.isoformat()
     
-    return {
+    payload = {
         "success": True,
         "has_cached": True,
         "matches": cached.get("matches", []),
         "updated_at": updated_at,
     }
+    await cache_set_json(key, payload)
+    
+    return payload
 
 
-class MatchItem(BaseModel):
-    nct_id: str = Field(..., description="NCT trial ID")
-    trial_title: Optional[str] = None
-    match_score: int = Field(..., ge=0, le=100)
-    reasoning: Optional[str] = None
-
-
-class MatchesPayload(BaseModel):
-    patient_id: str = Field(..., description="Patient ID")
-    matches: List[MatchItem] = Field(..., max_length=10)
-    send_email: bool = Field(default=True, description="Send Resend email to doctor/patient")
-
-
-@router.get("/matches")
+@router.get("/matches", responses={200: {"model": MatchListResponse}})
 async def list_matches(
     patient_id: Optional[str] = Query(default=None, description="Filter by patient ID"),
     limit: int = Query(default=100, ge=1, le=500, description="Maximum results")
@@ -82,42 +81,56 @@ async def list_matches(
     else:
         matches = await get_all_matches(limit=limit)
     
-    # Convert ObjectId to string for JSON serialization
-    for match in matches:
-        if "_id" in match:
-            match["_id"] = str(match["_id"])
-        if "patient_id" in match:
-            match["patient_id"] = str(match["patient_id"])
-    
-    return {
+    return orjson_response({
         "success": True,
         "count": len(matches),
         "matches": matches
-    }
+    })
 
 
 @router.post("/matches")
-async def post_matches(payload: MatchesPayload):
+async def post_matches(payload: MatchesPayload, request: Request, background_tasks: BackgroundTasks):
     """
     Store match results from the gateway and optionally send email via Resend.
     Gateway calls this after the agent returns top 3 matches.
+    
+    The email is sent after the response goes out, so the gateway does not
+    wait on the Resend API.
     """
     try:
         db = get_db()
     except RuntimeError:
         raise HTTPException(status_code=503, detail="Database unavailable")
 
-    matches_data = [m.model_dump() for m in payload.matches]
-    await save_matches(payload.patient_id, matches_data)
+    # One serializer call for the whole list instead of one per item
+    matches_data = payload.model_dump(include={"matches"})["matches"]
+    
+    # The email only needs the patient's contact details, so fetch them
+    # alongside the write rather than after it
+    if payload.send_email:
+        _, patient = await asyncio.gather(
+            save_matches(payload.patient_id, matches_data),
+            get_patient_by_id(payload.patient_id)
+        )
+    else:
+        await save_matches(payload.patient_id, matches_data)
+    await cache_delete(cache_key("cm", payload.patient_id))
 
     # Email notification
     email_result = {"sent": False, "skipped": True}
     
     if payload.send_email:
-        patient = await get_patient_by_id(payload.patient_id)
         if patient:
-            email_result = await send_match_notification(patient, matches_data)
-            email_result["skipped"] = False
+            # Published at startup; fall back when the lifespan hasn't run
+            settings = get_settings()
+            background_tasks.add_task(
+                send_match_notification,
+                patient,
+                matches_data,
+                api_key=getattr(request.app.state, "resend_api_key", settings.resend_api_key),
+                from_email=getattr(request.app.state, "resend_from_email", settings.resend_from_email)
+            )
+            email_result = {"queued": True, "skipped": False}
         else:
             email_result["error"] = "Patient not found"
             logger.warning(f"Cannot send email: Patient {payload.patient_id} not found")
@@ -4,22 +4,30 @@ Patients API Routes
 REST endpoints for patient management.
 """
 
-import math
-from typing import Any
-from fastapi import APIRouter, HTTPException
-from bson import ObjectId
+from functools import lru_cache
+
+import fastjsonschema
+import orjson
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.exceptions import RequestValidationError
+from pydantic import ValidationError
 from bson.errors import InvalidId
+from pymongo.errors import DuplicateKeyError
 
 from ..services.mongodb import (
     save_patient,
     get_patient_by_id,
     get_all_patients,
-    update_patient,
+    update_patient_return_new,
     delete_patient,
     get_db
 )
+from ..services.cache import cache_key, cache_delete
+from ..responses import orjson_response
 from ..models.schemas import (
-    PatientCreate,
+    PatientCreateSimple,
+    PatientCreateExtended,
+    validate_patient_simple,
     PatientUpdate,
     PatientListResponse,
     SuccessResponse,
@@ -29,30 +37,13 @@ from ..models.schemas import (
 router = APIRouter(prefix="/api/patients", tags=["patients"])
 
 
+@lru_cache(maxsize=512)
 def normalize_condition(condition: str) -> str:
-    """Normalize condition name."""
+    """Normalize condition name (memoized; the set of conditions is small)."""
     return condition.lower().replace(" ", "_")
 
 
-def sanitize_for_json(obj: Any) -> Any:
-    """
-    Recursively sanitize an object for JSON serialization.
-    Converts NaN, Infinity to None.
-    """
-    if isinstance(obj, dict):
-        return {k: sanitize_for_json(v) for k, v in obj.items()}
-    elif isinstance(obj, list):
-        return [sanitize_for_json(item) for item in obj]
-    elif isinstance(obj, float):
-        if math.isnan(obj) or math.isinf(obj):
-            return None
-        return obj
-    elif isinstance(obj, ObjectId):
-        return str(obj)
-    return obj
-
-
-@router.get("", response_model=PatientListResponse)
+@router.get("", responses={200: {"model": PatientListResponse}})
 async def list_patients():
     """
     Get all patients.
@@ -60,14 +51,12 @@ async def list_patients():
     try:
         patients = await get_all_patients()
         
-        # Sanitize for JSON (handles NaN, ObjectId, etc.)
-        patients = [sanitize_for_json(p) for p in patients]
-        
-        return PatientListResponse(
-            success=True,
-            count=len(patients),
-            patients=patients
-        )
+        # orjson_response handles ObjectId and NaN/Infinity
+        return orjson_response({
+            "success": True,
+            "count": len(patients),
+            "patients": patients
+        })
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -83,13 +72,11 @@ async def get_patient(patient_id: str):
         if not patient:
             raise HTTPException(status_code=404, detail="Patient not found")
         
-        # Sanitize for JSON (handles NaN, ObjectId, etc.)
-        patient = sanitize_for_json(patient)
-        
-        return {
+        # orjson_response handles ObjectId and NaN/Infinity
+        return orjson_response({
             "success": True,
             "patient": patient
-        }
+        })
     except InvalidId:
         raise HTTPException(status_code=400, detail="Invalid patient ID format")
     except HTTPException:
@@ -98,13 +85,9 @@ async def get_patient(patient_id: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.post("")
-async def create_patient(patient: PatientCreate):
-    """
-    Create a new patient.
-    """
+async def _insert_patient(patient_data: dict) -> dict:
+    """Normalize and store a patient document, returning the API response."""
     try:
-        patient_data = patient.model_dump()
         patient_data["condition"] = normalize_condition(patient_data["condition"])
         
         result = await save_patient(patient_data)
@@ -117,16 +100,70 @@ async def create_patient(patient: PatientCreate):
             "patient_id": inserted_id,
             "patient": response_patient,
         }
+    except DuplicateKeyError:
+        raise HTTPException(
+            status_code=400,
+            detail="A patient with this email already exists"
+        )
     except Exception as e:
-        # Handle duplicate email
-        if "duplicate key" in str(e).lower():
-            raise HTTPException(
-                status_code=400,
-                detail="A patient with this email already exists"
-            )
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def _simple_error(err: dict) -> dict:
+    """Prefix a PatientCreateSimple error with "body" and point extra fields at /import."""
+    err = {**err, "loc": ("body", *err["loc"])}
+    if err["type"] == "extra_forbidden":
+        err["msg"] = "Extra inputs are not permitted here; send full clinical profiles to POST /api/patients/import"
+    return err
+
+
+@router.post(
+    "",
+    openapi_extra={
+        "requestBody": {
+            "content": {"application/json": {"schema": PatientCreateSimple.model_json_schema()}},
+            "required": True,
+        }
+    },
+)
+async def create_patient(request: Request):
+    """
+    Create a new patient from the simple flat profile.
+    
+    The body is checked with the compiled JSON Schema validator first; only
+    payloads it rejects go through full pydantic validation for error details.
+    """
+    try:
+        body = orjson.loads(await request.body())
+    except orjson.JSONDecodeError:
+        raise RequestValidationError(
+            [{"type": "json_invalid", "loc": ("body",), "msg": "JSON decode error", "input": {}}]
+        )
+    
+    try:
+        patient = PatientCreateSimple.model_construct(**validate_patient_simple(body))
+    except fastjsonschema.JsonSchemaException:
+        try:
+            patient = PatientCreateSimple.model_validate(body)
+        except ValidationError as e:
+            raise RequestValidationError(
+                [_simple_error(err) for err in e.errors()],
+                body=body
+            )
+    
+    patient_data = patient.model_dump()
+    patient_data["data_source"] = "manual"
+    return await _insert_patient(patient_data)
+
+
+@router.post("/import")
+async def import_patient(patient: PatientCreateExtended):
+    """
+    Create a new patient with a full clinical profile (UI form or EHR import).
+    """
+    return await _insert_patient(patient.model_dump())
+
+
 @router.put("/{patient_id}")
 async def update_patient_endpoint(patient_id: str, updates: PatientUpdate):
     """
@@ -143,21 +180,23 @@ async def update_patient_endpoint(patient_id: str, updates: PatientUpdate):
         if "condition" in update_data:
             update_data["condition"] = normalize_condition(update_data["condition"])
         
-        result = await update_patient(patient_id, update_data)
+        # Update and fetch the new document in a single round-trip
+        patient = await update_patient_return_new(patient_id, update_data)
         
-        if result.matched_count == 0:
+        if patient is None:
             raise HTTPException(status_code=404, detail="Patient not found")
         
-        # Get updated patient
-        patient = await get_patient_by_id(patient_id)
-        patient = sanitize_for_json(patient)
-        
-        return {
+        return orjson_response({
             "success": True,
             "patient": patient
-        }
+        })
     except InvalidId:
         raise HTTPException(status_code=400, detail="Invalid patient ID format")
+    except DuplicateKeyError:
+        raise HTTPException(
+            status_code=400,
+            detail="A patient with this email already exists"
+        )
     except HTTPException:
         raise
     except Exception as e:
@@ -175,6 +214,8 @@ async def delete_patient_endpoint(patient_id: str):
         if result.deleted_count == 0:
             raise HTTPException(status_code=404, detail="Patient not found")
         
+        await cache_delete(cache_key("cm", patient_id))
+        
         return SuccessResponse(
             success=True,
             message="Patient deleted"
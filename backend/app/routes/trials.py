@@ -6,21 +6,34 @@ REST endpoints for trial data and crawl operations.
 
 import asyncio
 from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
 from typing import Optional
 
 from ..services.mongodb import (
     get_all_trials,
     get_trial_by_nct_id,
+    get_trials_by_nct_ids,
     get_trials_by_condition,
+    iter_trials_by_condition,
     get_unique_patient_conditions,
     get_trials_count,
     get_patients_count,
     get_matches_count,
     clear_crawl_index
 )
-from ..services.crawler import run_crawl
+from ..services.crawler import run_crawl, normalize_condition
+from ..services.cache import (
+    cache_key,
+    cache_get,
+    cache_set,
+    cache_tag,
+    cache_invalidate_tag
+)
+from ..responses import orjson_response
 from ..models.schemas import (
     TrialListResponse,
+    BatchTrialsRequest,
+    BatchTrialsResponse,
     CrawlRequest,
     CrawlResponse,
     FilesystemResponse,
@@ -30,6 +43,26 @@ from ..models.schemas import (
     BulkCrawlConditionResult
 )
 
+# The list view never shows the rendered markdown, which dominates document size
+_LIST_PROJECTION = {"markdown_content": 0}
+
+# Only the fields the agent filesystem index and files are built from
+_FILESYSTEM_PROJECTION = {
+    "nct_id": 1,
+    "title": 1,
+    "normalized_phase": 1,
+    "status": 1,
+    "condition": 1,
+    "locations": 1,
+    "markdown_content": 1,
+}
+
+# Markdown bodies larger than this are streamed in chunks of this size
+_MARKDOWN_CHUNK = 64 * 1024
+
+# Cache key prefixes for per-trial entries, invalidated per condition after a crawl
+_TRIAL_CACHE_PREFIXES = ("trial", "tmd")
+
 router = APIRouter(prefix="/api/trials", tags=["trials"])
 
 
@@ -74,7 +107,7 @@ async def clear_crawl_index_endpoint():
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.get("", response_model=TrialListResponse)
+@router.get("", responses={200: {"model": TrialListResponse}})
 async def list_trials(
     condition: Optional[str] = Query(default=None, description="Filter by condition"),
     status: Optional[str] = Query(default=None, description="Filter by status"),
@@ -85,20 +118,39 @@ async def list_trials(
     """
     try:
         if condition:
-            trials = await get_trials_by_condition(condition, status=status, limit=limit)
+            trials = await get_trials_by_condition(
+                normalize_condition(condition), status=status, limit=limit, projection=_LIST_PROJECTION
+            )
         else:
-            trials = await get_all_trials(limit=limit)
+            trials = await get_all_trials(limit=limit, projection=_LIST_PROJECTION)
         
-        # Convert ObjectId to string for JSON serialization
-        for trial in trials:
-            if "_id" in trial:
-                trial["_id"] = str(trial["_id"])
+        return orjson_response({
+            "success": True,
+            "count": len(trials),
+            "trials": trials
+        })
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/batch", responses={200: {"model": BatchTrialsResponse}})
+async def get_trials_batch(request: BatchTrialsRequest):
+    """
+    Get several trials by NCT ID in one round-trip.
+    
+    Use this instead of one GET /{nct_id} per trial.
+    """
+    try:
+        # dict.fromkeys de-duplicates while keeping request order
+        nct_ids = list(dict.fromkeys(request.nct_ids))
+        trials = await get_trials_by_nct_ids(nct_ids)
         
-        return TrialListResponse(
-            success=True,
-            count=len(trials),
-            trials=trials
-        )
+        return orjson_response({
+            "success": True,
+            "count": len(trials),
+            "trials": trials,
+            "missing": [n for n in nct_ids if n not in trials]
+        })
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -109,41 +161,64 @@ async def get_trial(nct_id: str):
     Get a specific trial by NCT ID.
     """
     try:
+        key = cache_key("trial", nct_id)
+        cached = await cache_get(key)
+        if cached is not None:
+            return Response(content=cached, media_type="application/json")
+        
         trial = await get_trial_by_nct_id(nct_id)
         
         if not trial:
             raise HTTPException(status_code=404, detail=f"Trial {nct_id} not found")
         
-        # Convert ObjectId to string
-        if "_id" in trial:
-            trial["_id"] = str(trial["_id"])
-        
-        return {
+        response = orjson_response({
             "success": True,
             "trial": trial
-        }
+        })
+        await cache_set(key, response.body)
+        await cache_tag(cache_key("trials", trial.get("condition", "")), nct_id)
+        
+        return response
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def _markdown_response(markdown: bytes) -> Response:
+    """Return small markdown bodies directly and stream large ones in chunks."""
+    if len(markdown) <= _MARKDOWN_CHUNK:
+        return PlainTextResponse(content=markdown, media_type="text/markdown")
+    
+    async def chunks():
+        view = memoryview(markdown)
+        for start in range(0, len(view), _MARKDOWN_CHUNK):
+            yield bytes(view[start:start + _MARKDOWN_CHUNK])
+    
+    return StreamingResponse(chunks(), media_type="text/markdown")
+
+
 @router.get("/{nct_id}/markdown")
 async def get_trial_markdown(nct_id: str):
     """
     Get trial markdown content for agent filesystem.
     """
     try:
-        trial = await get_trial_by_nct_id(nct_id)
+        key = cache_key("tmd", nct_id)
+        cached = await cache_get(key)
+        if cached is not None:
+            return _markdown_response(cached)
+        
+        trial = await get_trial_by_nct_id(nct_id, projection={"markdown_content": 1, "condition": 1})
         
         if not trial:
             raise HTTPException(status_code=404, detail=f"Trial {nct_id} not found")
         
-        from fastapi.responses import PlainTextResponse
-        return PlainTextResponse(
-            content=trial.get("markdown_content", ""),
-            media_type="text/markdown"
-        )
+        markdown = (trial.get("markdown_content") or "").encode()
+        await cache_set(key, markdown)
+        await cache_tag(cache_key("trials", trial.get("condition", "")), nct_id)
+        
+        return _markdown_response(markdown)
     except HTTPException:
         raise
     except Exception as e:
@@ -165,6 +240,11 @@ async def trigger_crawl(request: CrawlRequest):
             force_refresh=request.force_refresh
         )
         
+        # Drop cached trial details for this condition so updates show up
+        await cache_invalidate_tag(
+            cache_key("trials", normalize_condition(request.condition)), _TRIAL_CACHE_PREFIXES
+        )
+        
         # Convert datetime objects for JSON serialization
         if stats.get("start_time"):
             stats["start_time"] = stats["start_time"].isoformat()
@@ -179,7 +259,7 @@ async def trigger_crawl(request: CrawlRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.post("/crawl/bulk", response_model=BulkCrawlResponse)
+@router.post("/crawl/bulk", responses={200: {"model": BulkCrawlResponse}})
 async def trigger_bulk_crawl(request: BulkCrawlRequest):
     """
     Trigger a bulk crawl job for multiple conditions.
@@ -196,89 +276,88 @@ async def trigger_bulk_crawl(request: BulkCrawlRequest):
             conditions = await get_unique_patient_conditions()
             
         if not conditions:
-            return BulkCrawlResponse(
-                success=True,
-                conditions_crawled=[],
-                summary={
+            return orjson_response({
+                "success": True,
+                "conditions_crawled": [],
+                "summary": {
                     "total_fetched": 0,
                     "new_added": 0,
                     "updated": 0,
                     "duplicates_skipped": 0
                 },
-                details=[]
-            )
+                "details": []
+            })
         
         print(f"🕷️  API: Starting bulk crawl for {len(conditions)} conditions: {conditions} (force_refresh={request.force_refresh})")
         
-        # Crawl each condition (sequentially to avoid rate limiting)
-        details = []
+        # Crawl conditions concurrently, bounded so we don't flood the API
+        sem = asyncio.Semaphore(request.max_concurrency)
+        
+        async def crawl_one(condition: str) -> BulkCrawlConditionResult:
+            async with sem:
+                try:
+                    print(f"   📥 Crawling: {condition}")
+                    
+                    stats = await run_crawl(
+                        condition=condition,
+                        max_trials=request.max_trials_per_condition,
+                        enrich_with_firecrawl=request.enrich_with_firecrawl,
+                        force_refresh=request.force_refresh
+                    )
+                    await cache_invalidate_tag(
+                        cache_key("trials", normalize_condition(condition)), _TRIAL_CACHE_PREFIXES
+                    )
+                    
+                    return BulkCrawlConditionResult(
+                        condition=condition,
+                        fetched=stats.get("total_fetched", 0),
+                        new=stats.get("new_trials", 0),
+                        updated=stats.get("updated_trials", 0),
+                        skipped=stats.get("skipped_trials", 0)
+                    )
+                    
+                except Exception as e:
+                    print(f"   ❌ Error crawling {condition}: {e}")
+                    return BulkCrawlConditionResult(
+                        condition=condition,
+                        fetched=0,
+                        new=0,
+                        updated=0,
+                        skipped=0,
+                        error=str(e)
+                    )
+        
+        details = await asyncio.gather(*[crawl_one(c) for c in conditions])
+        
         total_fetched = 0
         total_new = 0
         total_updated = 0
         total_skipped = 0
-        
-        for condition in conditions:
-            try:
-                print(f"   📥 Crawling: {condition}")
-                
-                stats = await run_crawl(
-                    condition=condition,
-                    max_trials=request.max_trials_per_condition,
-                    enrich_with_firecrawl=request.enrich_with_firecrawl,
-                    force_refresh=request.force_refresh
-                )
-                
-                fetched = stats.get("total_fetched", 0)
-                new = stats.get("new_trials", 0)
-                updated = stats.get("updated_trials", 0)
-                skipped = stats.get("skipped", 0)
-                
-                details.append(BulkCrawlConditionResult(
-                    condition=condition,
-                    fetched=fetched,
-                    new=new,
-                    updated=updated,
-                    skipped=skipped
-                ))
-                
-                total_fetched += fetched
-                total_new += new
-                total_updated += updated
-                total_skipped += skipped
-                
-                # Small delay between conditions to be nice to the API
-                await asyncio.sleep(0.5)
-                
-            except Exception as e:
-                print(f"   ❌ Error crawling {condition}: {e}")
-                details.append(BulkCrawlConditionResult(
-                    condition=condition,
-                    fetched=0,
-                    new=0,
-                    updated=0,
-                    skipped=0,
-                    error=str(e)
-                ))
+        for d in details:
+            total_fetched += d.fetched
+            total_new += d.new
+            total_updated += d.updated
+            total_skipped += d.skipped
         
         print(f"🕷️  API: Bulk crawl complete. {total_new} new trials added.")
         
-        return BulkCrawlResponse(
-            success=True,
-            conditions_crawled=conditions,
-            summary={
+        return orjson_response({
+            "success": True,
+            "conditions_crawled": conditions,
+            "summary": {
                 "total_fetched": total_fetched,
                 "new_added": total_new,
                 "updated": total_updated,
                 "duplicates_skipped": total_skipped
             },
-            details=details
-        )
+            "details": details
+        })
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.get("/filesystem/{condition}", response_model=FilesystemResponse)
+@router.get("/filesystem/{condition}", responses={200: {"model": FilesystemResponse}})
 async def get_filesystem(
     condition: str,
     limit: int = Query(default=15, ge=1, le=50, description="Max trials to include")
@@ -291,53 +370,59 @@ async def get_filesystem(
     Includes a summary index file for quick navigation.
     """
     try:
-        # Get all trials but limit what we send to the agent
-        trials = await get_trials_by_condition(condition, status="RECRUITING", limit=limit)
+        # Stream trials (limited to keep the agent's context small), pulling
+        # each one's fields once as it arrives:
+        # (nct_id, title, phase, status, city, condition, markdown)
+        rows = [
+            (
+                t.get("nct_id", "unknown"),
+                t.get("title", "Unknown")[:50],
+                t.get("normalized_phase", "other"),
+                t.get("status", "Unknown"),
+                t["locations"][0].get("city", "N/A") if t.get("locations") else "N/A",
+                t.get("condition", "unknown"),
+                t.get("markdown_content", ""),
+            )
+            async for t in iter_trials_by_condition(
+                normalize_condition(condition), status="RECRUITING", limit=limit, projection=_FILESYSTEM_PROJECTION
+            )
+        ]
         
-        # Build filesystem structure
-        filesystem = {}
+        # Full markdown file per trial
+        filesystem = {
+            f"trials/{cond}/{phase}/{nct_id}.md": markdown
+            for nct_id, _, phase, _, _, cond, markdown in rows
+        }
         
-        # Create an index/summary file for quick reference
+        # Index/summary file for quick reference
         index_lines = [
             f"# Clinical Trials for {condition.replace('_', ' ').title()}",
-            f"",
-            f"Total trials: {len(trials)}",
-            f"",
-            f"## Quick Reference",
-            f"",
-            f"| NCT ID | Title | Phase | Status | Location |",
-            f"|--------|-------|-------|--------|----------|",
+            "",
+            f"Total trials: {len(rows)}",
+            "",
+            "## Quick Reference",
+            "",
+            "| NCT ID | Title | Phase | Status | Location |",
+            "|--------|-------|-------|--------|----------|",
         ]
+        index_lines.extend([
+            f"| {nct_id} | {title}... | {phase} | {status} | {city} |"
+            for nct_id, title, phase, status, city, _, _ in rows
+        ])
+        index_lines.extend([
+            "",
+            "## How to Use",
+            "- Use `cat trials/{condition}/{phase}/{NCT_ID}.md` to read full trial details",
+            "- Check eligibility criteria carefully for patient matching",
+        ])
         
-        for trial in trials:
-            cond = trial.get("condition", "unknown")
-            phase = trial.get("normalized_phase", "other")
-            nct_id = trial.get("nct_id", "unknown")
-            title = trial.get("title", "Unknown")[:50]
-            status = trial.get("status", "Unknown")
-            locations = trial.get("locations", [])
-            location_str = locations[0].get("city", "N/A") if locations else "N/A"
-            
-            # Add to index
-            index_lines.append(f"| {nct_id} | {title}... | {phase} | {status} | {location_str} |")
-            
-            # Add full markdown file
-            path = f"trials/{cond}/{phase}/{nct_id}.md"
-            filesystem[path] = trial.get("markdown_content", "")
-        
-        index_lines.append("")
-        index_lines.append("## How to Use")
-        index_lines.append("- Use `cat trials/{condition}/{phase}/{NCT_ID}.md` to read full trial details")
-        index_lines.append("- Check eligibility criteria carefully for patient matching")
-        
-        # Add index file
         filesystem["trials/INDEX.md"] = "\n".join(index_lines)
         
-        return FilesystemResponse(
-            success=True,
-            condition=condition,
-            trial_count=len(trials),
-            filesystem=filesystem
-        )
+        return orjson_response({
+            "success": True,
+            "condition": condition,
+            "trial_count": len(rows),
+            "filesystem": filesystem
+        })
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
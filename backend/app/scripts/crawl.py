@@ -7,10 +7,12 @@ Usage:
     python -m app.scripts.crawl --test                    # Test mode (3 trials)
     python -m app.scripts.crawl --condition "breast cancer"
     python -m app.scripts.crawl --condition "multiple sclerosis" --max 100
+    python -m app.scripts.crawl --test --verbose          # Log every processed trial
 """
 
 import asyncio
 import argparse
+import logging
 import sys
 from pathlib import Path
 
@@ -22,7 +24,8 @@ load_dotenv()
 
 from app.config import get_settings
 from app.services.mongodb import connect_mongodb, close_mongodb
-from app.services.firecrawl import init_firecrawl
+from app.services.clinicaltrials import close_client
+from app.services.firecrawl import init_firecrawl, close_firecrawl
 from app.services.crawler import run_crawl, run_multi_crawl
 
 
@@ -44,9 +47,14 @@ async def main():
     parser.add_argument("--test", "-t", action="store_true", help="Test mode (3 trials)")
     parser.add_argument("--enrich", "-e", action="store_true", help="Enrich with Firecrawl")
     parser.add_argument("--force", "-f", action="store_true", help="Force refresh all trials")
+    parser.add_argument("--verbose", "-v", action="store_true", help="Log every processed trial")
     
     args = parser.parse_args()
     
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    if args.verbose:
+        logging.getLogger("app.services.crawler").setLevel(logging.DEBUG)
+    
     print("\n🏥 Clinical Trial Crawler")
     print("═" * 60)
     
@@ -103,6 +111,8 @@ async def main():
         print(f"\n❌ Fatal error: {e}")
         sys.exit(1)
     finally:
+        await close_client()
+        await close_firecrawl()
         await close_mongodb()
 
 
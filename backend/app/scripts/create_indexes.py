@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+CLI script to create MongoDB indexes.
+
+Run on deploy when the API starts with SKIP_INDEX_INIT=true. Safe to
+re-run: existing indexes are left as they are.
+
+Usage:
+    python -m app.scripts.create_indexes
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from dotenv import load_dotenv
+load_dotenv()
+
+from app.config import get_settings
+from app.services.mongodb import connect_mongodb, close_mongodb, create_indexes
+
+
+async def main():
+    """Main entry point for index creation CLI."""
+    settings = get_settings()
+    
+    if not settings.mongodb_uri:
+        print("❌ MONGODB_URI not set in .env file")
+        sys.exit(1)
+    
+    try:
+        await connect_mongodb(settings.mongodb_uri, init_indexes=False)
+        await create_indexes()
+        print("\n✅ Indexes ready\n")
+    except Exception as e:
+        print(f"\n❌ Index creation failed: {e}")
+        sys.exit(1)
+    finally:
+        await close_mongodb()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,169 @@
+"""
+Cache Service using Redis
+
+Read-through hot cache for rarely-changing documents (cached matches,
+trial details and markdown). Every helper is best-effort: if Redis is not
+configured or a call fails, callers fall back to MongoDB.
+"""
+
+import logging
+from typing import Any, Dict, Iterable, Optional
+
+import orjson
+
+logger = logging.getLogger(__name__)
+
+# Check if redis is available
+try:
+    from redis.asyncio import Redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+# Default time-to-live for cached entries (seconds)
+DEFAULT_TTL = 300
+
+# Global Redis client (None = cache disabled)
+_redis: Optional["Redis"] = None
+
+# Process-local hit/miss counters
+_stats: Dict[str, int] = {"hits": 0, "misses": 0}
+
+
+def cache_key(prefix: str, ident: str) -> str:
+    """Build a namespaced cache key, e.g. cache_key("tmd", "NCT01234567")."""
+    return f"{prefix}:{ident}"
+
+
+async def init_cache(url: str) -> None:
+    """
+    Connect to Redis.
+
+    Args:
+        url: Redis connection URL (redis://host:port/db)
+    """
+    global _redis
+
+    if not url:
+        raise ValueError("REDIS_URL is required")
+    if not REDIS_AVAILABLE:
+        logger.warning("redis package not installed - cache disabled")
+        return
+
+    _redis = Redis.from_url(url)
+    await _redis.ping()
+    print("⚡ Redis cache connected")
+
+
+async def close_cache() -> None:
+    """Close the Redis connection."""
+    global _redis
+
+    if _redis is not None:
+        await _redis.aclose()
+        _redis = None
+
+
+def get_cache_stats() -> Dict[str, int]:
+    """Get cache hit/miss counters for this process."""
+    return dict(_stats)
+
+
+async def cache_get(key: str) -> Optional[bytes]:
+    """
+    Get raw bytes from the cache.
+
+    Returns:
+        Cached bytes, or None on a miss or when the cache is unavailable
+    """
+    if _redis is None:
+        return None
+
+    try:
+        value = await _redis.get(key)
+    except Exception as e:
+        logger.warning(f"Cache get failed for {key}: {e}")
+        return None
+
+    if value is None:
+        _stats["misses"] += 1
+    else:
+        _stats["hits"] += 1
+    return value
+
+
+async def cache_set(key: str, value: bytes, ttl: int = DEFAULT_TTL) -> None:
+    """Store raw bytes in the cache with a TTL."""
+    if _redis is None:
+        return
+
+    try:
+        await _redis.set(key, value, ex=ttl)
+    except Exception as e:
+        logger.warning(f"Cache set failed for {key}: {e}")
+
+
+async def cache_get_json(key: str) -> Optional[Any]:
+    """Get a JSON value from the cache."""
+    value = await cache_get(key)
+    return orjson.loads(value) if value is not None else None
+
+
+async def cache_set_json(key: str, obj: Any, ttl: int = DEFAULT_TTL) -> None:
+    """Store a JSON-serializable value in the cache."""
+    await cache_set(key, orjson.dumps(obj, default=str), ttl)
+
+
+async def cache_delete(*keys: str) -> None:
+    """Delete one or more cache keys."""
+    if _redis is None or not keys:
+        return
+
+    try:
+        await _redis.delete(*keys)
+    except Exception as e:
+        logger.warning(f"Cache delete failed: {e}")
+
+
+async def cache_tag(tag: str, member: str, ttl: int = DEFAULT_TTL) -> None:
+    """
+    Record a member under a tag set so it can be invalidated as a group.
+
+    Args:
+        tag: Tag key (e.g. cache_key("trials", condition))
+        member: Identifier to record (e.g. an NCT ID)
+        ttl: Tag lifetime; refreshed on every add so it outlives its members
+    """
+    if _redis is None:
+        return
+
+    try:
+        async with _redis.pipeline(transaction=False) as pipe:
+            pipe.sadd(tag, member)
+            pipe.expire(tag, ttl)
+            await pipe.execute()
+    except Exception as e:
+        logger.warning(f"Cache tag failed for {tag}: {e}")
+
+
+async def cache_invalidate_tag(tag: str, prefixes: Iterable[str]) -> None:
+    """
+    Delete every key recorded under a tag, plus the tag itself.
+
+    Args:
+        tag: Tag key passed to cache_tag()
+        prefixes: Key prefixes to invalidate for each member
+    """
+    if _redis is None:
+        return
+
+    try:
+        members = await _redis.smembers(tag)
+        keys = [
+            cache_key(prefix, m.decode() if isinstance(m, bytes) else m)
+            for m in members
+            for prefix in prefixes
+        ]
+        await _redis.delete(tag, *keys)
+    except Exception as e:
+        logger.warning(f"Cache invalidation failed for {tag}: {e}")
@@ -5,12 +5,59 @@ Fetches clinical trial data from the official US government API.
 API Docs: https://clinicaltrials.gov/data-api/api
 """
 
+import re
+from functools import lru_cache
+from types import MappingProxyType
+
 import httpx
+import orjson
 from typing import Optional, List, Dict, Any
 
 CLINICALTRIALS_API = "https://clinicaltrials.gov/api/v2/studies"
 
+# Largest pageSize the v2 API accepts
+MAX_PAGE_SIZE = 1000
+
+# Shared client so crawls reuse pooled keep-alive connections
+_client: Optional[httpx.AsyncClient] = None
+
+
+def get_client() -> httpx.AsyncClient:
+    """Get the shared ClinicalTrials.gov HTTP client, creating it on first use."""
+    global _client
+    
+    if _client is None:
+        _client = httpx.AsyncClient(
+            http2=True,
+            timeout=30.0,
+            limits=httpx.Limits(max_keepalive_connections=20, max_connections=100)
+        )
+    return _client
+
+
+async def close_client() -> None:
+    """Close the shared HTTP client."""
+    global _client
+    
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+# Shared read-only default for missing API sections
+_EMPTY = MappingProxyType({})
 
+# Special cases for better API matching
+_API_CONDITION_REPLACEMENTS = {
+    "Alzheimers": "Alzheimer's",
+    "Parkinsons": "Parkinson's",
+    "Type 2 Diabetes": "Diabetes Mellitus, Type 2",
+    "Diabetes Type 2": "Diabetes Mellitus, Type 2",
+}
+_API_CONDITION_RE = re.compile("|".join(map(re.escape, _API_CONDITION_REPLACEMENTS)))
+
+
+@lru_cache(maxsize=256)
 def format_condition_for_api(condition: str) -> str:
     """
     Convert normalized condition name to API-friendly format.
@@ -26,26 +73,16 @@ def format_condition_for_api(condition: str) -> str:
     # Title case
     formatted = formatted.title()
     
-    # Handle special cases for better API matching
-    replacements = {
-        "Alzheimers": "Alzheimer's",
-        "Parkinsons": "Parkinson's",
-        "Type 2 Diabetes": "Diabetes Mellitus, Type 2",
-        "Diabetes Type 2": "Diabetes Mellitus, Type 2",
-    }
-    
-    for old, new in replacements.items():
-        if old in formatted:
-            formatted = formatted.replace(old, new)
-    
-    return formatted
+    # Handle special cases in a single pass
+    return _API_CONDITION_RE.sub(lambda m: _API_CONDITION_REPLACEMENTS[m.group(0)], formatted)
 
 
 async def fetch_trials(
     condition: str,
     status: str = "RECRUITING",
     page_size: int = 50,
-    page_token: Optional[str] = None
+    page_token: Optional[str] = None,
+    if_modified_since: Optional[str] = None
 ) -> Dict[str, Any]:
     """
     Fetch trials from ClinicalTrials.gov API.
@@ -55,9 +92,11 @@ async def fetch_trials(
         status: Trial status (default: RECRUITING)
         page_size: Number of results per page (max 1000)
         page_token: Token for pagination
+        if_modified_since: Last-Modified value from a previous fetch; the API
+            answers 304 with no body if nothing changed since then
         
     Returns:
-        Dict with trials, nextPageToken, and totalCount
+        Dict with trials, nextPageToken, totalCount, last_modified and not_modified
     """
     # Convert normalized condition to API-friendly format
     api_condition = format_condition_for_api(condition)
@@ -71,12 +110,31 @@ async def fetch_trials(
     if page_token:
         params["pageToken"] = page_token
     
+    headers = {"If-Modified-Since": if_modified_since} if if_modified_since else None
+    
     print(f"📡 Fetching from ClinicalTrials.gov: {api_condition} ({status})")
     
-    async with httpx.AsyncClient() as client:
-        response = await client.get(CLINICALTRIALS_API, params=params, timeout=30.0)
+    # Stream the body into one buffer: a 1000-trial page can be tens of MB and
+    # a buffered read briefly holds both the received chunks and their join
+    async with get_client().stream(
+        "GET", CLINICALTRIALS_API, params=params, headers=headers
+    ) as response:
+        if response.status_code == 304:
+            print("   Not modified since last crawl")
+            return {
+                "trials": [],
+                "next_page_token": None,
+                "total_count": 0,
+                "last_modified": if_modified_since,
+                "not_modified": True
+            }
+        
         response.raise_for_status()
-        data = response.json()
+        body = bytearray()
+        async for chunk in response.aiter_bytes():
+            body += chunk
+    
+    data = orjson.loads(body)
     
     trials = data.get("studies", [])
     print(f"   Found {len(trials)} trials")
@@ -84,32 +142,51 @@ async def fetch_trials(
     return {
         "trials": trials,
         "next_page_token": data.get("nextPageToken"),
-        "total_count": data.get("totalCount", 0)
+        "total_count": data.get("totalCount", 0),
+        "last_modified": response.headers.get("Last-Modified"),
+        "not_modified": False
     }
 
 
-async def fetch_all_trials(condition: str, max_trials: int = 100) -> List[Dict]:
+async def fetch_all_trials_if_modified(
+    condition: str,
+    max_trials: int = 100,
+    if_modified_since: Optional[str] = None
+) -> Dict[str, Any]:
     """
-    Fetch all trials for a condition (handles pagination).
+    Fetch all trials for a condition unless the result set is unchanged.
+    
+    The conditional header is only sent with the first page; a 304 there
+    means the search results have not changed and no pages are downloaded.
     
     Args:
         condition: Medical condition
         max_trials: Maximum trials to fetch
+        if_modified_since: Last-Modified value stored from the previous crawl
         
     Returns:
-        List of all trials
+        Dict with trials, last_modified (of the first page, if the API sent
+        one) and not_modified
     """
     all_trials = []
     page_token = None
+    last_modified = None
     
     while len(all_trials) < max_trials:
-        page_size = min(50, max_trials - len(all_trials))
+        page_size = min(MAX_PAGE_SIZE, max_trials - len(all_trials))
         result = await fetch_trials(
             condition=condition,
             page_size=page_size,
-            page_token=page_token
+            page_token=page_token,
+            if_modified_since=None if page_token else if_modified_since
         )
         
+        if result["not_modified"]:
+            return {"trials": [], "last_modified": if_modified_since, "not_modified": True}
+        
+        if page_token is None:
+            last_modified = result["last_modified"]
+        
         all_trials.extend(result["trials"])
         
         if not result["next_page_token"] or len(result["trials"]) == 0:
@@ -117,7 +194,27 @@ async def fetch_all_trials(condition: str, max_trials: int = 100) -> List[Dict]:
         
         page_token = result["next_page_token"]
     
-    return all_trials
+    return {"trials": all_trials, "last_modified": last_modified, "not_modified": False}
+
+
+async def fetch_all_trials(condition: str, max_trials: int = 100) -> List[Dict]:
+    """
+    Fetch all trials for a condition (handles pagination).
+    
+    The v2 API chains pages through opaque nextPageToken values, so pages
+    cannot be requested in parallel; instead each request asks for as many
+    trials as the API allows, keeping the number of sequential round-trips
+    to ceil(max_trials / MAX_PAGE_SIZE).
+    
+    Args:
+        condition: Medical condition
+        max_trials: Maximum trials to fetch
+        
+    Returns:
+        List of all trials
+    """
+    result = await fetch_all_trials_if_modified(condition, max_trials)
+    return result["trials"]
 
 
 async def fetch_trial_by_id(nct_id: str) -> Dict:
@@ -132,10 +229,9 @@ async def fetch_trial_by_id(nct_id: str) -> Dict:
     """
     url = f"{CLINICALTRIALS_API}/{nct_id}"
     
-    async with httpx.AsyncClient() as client:
-        response = await client.get(url, timeout=30.0)
-        response.raise_for_status()
-        return response.json()
+    response = await get_client().get(url)
+    response.raise_for_status()
+    return orjson.loads(response.content)
 
 
 def parse_trial_data(raw_trial: Dict) -> Dict[str, Any]:
@@ -148,36 +244,38 @@ def parse_trial_data(raw_trial: Dict) -> Dict[str, Any]:
     Returns:
         Parsed trial data
     """
-    protocol = raw_trial.get("protocolSection", {})
-    identification = protocol.get("identificationModule", {})
-    status_module = protocol.get("statusModule", {})
-    design = protocol.get("designModule", {})
-    eligibility = protocol.get("eligibilityModule", {})
-    contacts = protocol.get("contactsLocationsModule", {})
-    description = protocol.get("descriptionModule", {})
-    sponsor_module = protocol.get("sponsorCollaboratorsModule", {})
-    outcomes = protocol.get("outcomesModule", {})
-    arms = protocol.get("armsInterventionsModule", {})
+    protocol = raw_trial.get("protocolSection") or _EMPTY
+    identification = protocol.get("identificationModule") or _EMPTY
+    status_module = protocol.get("statusModule") or _EMPTY
+    design = protocol.get("designModule") or _EMPTY
+    eligibility = protocol.get("eligibilityModule") or _EMPTY
+    contacts = protocol.get("contactsLocationsModule") or _EMPTY
+    description = protocol.get("descriptionModule") or _EMPTY
+    sponsor_module = protocol.get("sponsorCollaboratorsModule") or _EMPTY
+    outcomes = protocol.get("outcomesModule") or _EMPTY
+    arms = protocol.get("armsInterventionsModule") or _EMPTY
+    
+    nct_id = identification.get("nctId")
     
     # Extract phases
-    phases = design.get("phases", [])
+    phases = design.get("phases")
     phase_str = ", ".join(phases) if phases else "N/A"
     
     return {
-        "nct_id": identification.get("nctId"),
+        "nct_id": nct_id,
         "title": identification.get("briefTitle"),
         "official_title": identification.get("officialTitle"),
         
         # Status info
         "status": status_module.get("overallStatus"),
-        "start_date": status_module.get("startDateStruct", {}).get("date"),
-        "completion_date": status_module.get("completionDateStruct", {}).get("date"),
+        "start_date": (status_module.get("startDateStruct") or _EMPTY).get("date"),
+        "completion_date": (status_module.get("completionDateStruct") or _EMPTY).get("date"),
         "last_updated": status_module.get("lastUpdateSubmitDate"),
         
         # Design info
         "phase": phase_str,
         "study_type": design.get("studyType"),
-        "enrollment": design.get("enrollmentInfo", {}).get("count"),
+        "enrollment": (design.get("enrollmentInfo") or _EMPTY).get("count"),
         
         # Eligibility
         "eligibility_criteria": eligibility.get("eligibilityCriteria"),
@@ -191,8 +289,8 @@ def parse_trial_data(raw_trial: Dict) -> Dict[str, Any]:
         "detailed_description": description.get("detailedDescription"),
         
         # Sponsor
-        "sponsor": sponsor_module.get("leadSponsor", {}).get("name"),
-        "collaborators": [c.get("name") for c in sponsor_module.get("collaborators", [])],
+        "sponsor": (sponsor_module.get("leadSponsor") or _EMPTY).get("name"),
+        "collaborators": [c.get("name") for c in sponsor_module.get("collaborators") or ()],
         
         # Locations
         "locations": [
@@ -203,7 +301,7 @@ def parse_trial_data(raw_trial: Dict) -> Dict[str, Any]:
                 "country": loc.get("country"),
                 "zip": loc.get("zip")
             }
-            for loc in contacts.get("locations", [])
+            for loc in contacts.get("locations") or ()
         ],
         
         # Contacts
@@ -214,7 +312,7 @@ def parse_trial_data(raw_trial: Dict) -> Dict[str, Any]:
                 "email": c.get("email"),
                 "phone": c.get("phone")
             }
-            for c in contacts.get("centralContacts", [])
+            for c in contacts.get("centralContacts") or ()
         ],
         
         # Interventions
@@ -224,7 +322,7 @@ def parse_trial_data(raw_trial: Dict) -> Dict[str, Any]:
                 "name": i.get("name"),
                 "description": i.get("description")
             }
-            for i in arms.get("interventions", [])
+            for i in arms.get("interventions") or ()
         ],
         
         # Outcomes
@@ -233,9 +331,9 @@ def parse_trial_data(raw_trial: Dict) -> Dict[str, Any]:
                 "measure": o.get("measure"),
                 "time_frame": o.get("timeFrame")
             }
-            for o in outcomes.get("primaryOutcomes", [])
+            for o in outcomes.get("primaryOutcomes") or ()
         ],
         
         # Source URL
-        "source_url": f"https://clinicaltrials.gov/study/{identification.get('nctId')}"
+        "source_url": f"https://clinicaltrials.gov/study/{nct_id}"
     }
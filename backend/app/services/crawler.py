@@ -9,34 +9,88 @@ Orchestrates the crawling process:
 5. Saves to MongoDB
 """
 
-import hashlib
+import asyncio
+import logging
 import re
-from typing import Dict, Any, List, Optional
+import time
+from functools import lru_cache
+from typing import Dict, Any, List, Optional, Tuple
 from datetime import datetime
 
-from .clinicaltrials import fetch_trials, parse_trial_data
+import xxhash
+
+from .clinicaltrials import fetch_all_trials_if_modified, parse_trial_data
 from .firecrawl import scrape_trial_page
 from .mongodb import (
-    get_all_crawl_records,
-    update_crawl_record,
+    get_crawl_record_hashes,
+    get_crawl_last_modified,
+    set_crawl_last_modified,
+    update_crawl_records,
     save_trials
 )
 
+# Runs of anything other than lowercase letters/digits collapse to "_"
+_NON_ALNUM_RE = re.compile(r'[^a-z0-9]+')
+
+logger = logging.getLogger(__name__)
+
+# Section divider for console output
+_BAR = "═" * 60
+
+# Print a progress line every N processed trials
+_PROGRESS_EVERY = 50
+
+
+def _hash_fields(title: Optional[str], status: Optional[str], criteria: Optional[str]) -> str:
+    """Hash the change-detection fields (unit-separated so fields can't run together)."""
+    data_to_hash = f"{title or ''}\x1f{status or ''}\x1f{criteria or ''}"
+    return xxhash.xxh64(data_to_hash.encode()).hexdigest()
+
 
 def hash_trial_data(trial: Dict) -> str:
     """
     Generate a hash of trial data for change detection.
     
+    Non-cryptographic: the hash is only compared against the stored
+    source_hash to decide whether a trial changed.
+    
     Args:
         trial: Trial data
         
     Returns:
-        MD5 hash string
+        xxHash64 hex digest
+    """
+    return _hash_fields(trial.get('title'), trial.get('status'), trial.get('eligibility_criteria'))
+
+
+def hash_raw_trial(raw_trial: Dict) -> str:
+    """
+    Hash a raw API trial without parsing it first.
+    
+    Reads the same three fields parse_trial_data maps to title, status and
+    eligibility_criteria, so the result equals hash_trial_data(parsed).
+    
+    Args:
+        raw_trial: Raw trial from the ClinicalTrials.gov API
+        
+    Returns:
+        xxHash64 hex digest
     """
-    data_to_hash = f"{trial.get('title', '')}{trial.get('status', '')}{trial.get('eligibility_criteria', '')}"
-    return hashlib.md5(data_to_hash.encode()).hexdigest()
+    protocol = raw_trial.get("protocolSection") or {}
+    return _hash_fields(
+        (protocol.get("identificationModule") or {}).get("briefTitle"),
+        (protocol.get("statusModule") or {}).get("overallStatus"),
+        (protocol.get("eligibilityModule") or {}).get("eligibilityCriteria")
+    )
 
 
+def raw_nct_id(raw_trial: Dict) -> Optional[str]:
+    """Get the NCT ID from a raw API trial."""
+    protocol = raw_trial.get("protocolSection") or {}
+    return (protocol.get("identificationModule") or {}).get("nctId")
+
+
+@lru_cache(maxsize=256)
 def normalize_condition(condition: str) -> str:
     """
     Normalize condition name for consistent storage.
@@ -48,11 +102,12 @@ def normalize_condition(condition: str) -> str:
         Normalized name (lowercase, underscores)
     """
     normalized = condition.lower()
-    normalized = re.sub(r'[^a-z0-9]+', '_', normalized)
+    normalized = _NON_ALNUM_RE.sub('_', normalized)
     normalized = normalized.strip('_')
     return normalized
 
 
+@lru_cache(maxsize=256)
 def normalize_phase(phase: str) -> str:
     """
     Normalize phase for folder structure.
@@ -171,6 +226,35 @@ def generate_trial_markdown(trial: Dict) -> str:
 """
 
 
+def start_enrichment(nct_ids: List[str], max_concurrency: int = 10) -> List[asyncio.Task]:
+    """
+    Start scraping each trial's page in the background.
+    
+    Scrapes only need the NCT ID, so they can be launched before the trials
+    are parsed and overlap with the rest of the crawl.
+    
+    Args:
+        nct_ids: Trials to enrich
+        max_concurrency: Maximum scrapes in flight at once
+        
+    Returns:
+        Tasks resolving to (nct_id, markdown or None)
+    """
+    sem = asyncio.Semaphore(max_concurrency)
+    
+    async def enrich_one(nct_id: str) -> Tuple[str, Optional[str]]:
+        async with sem:
+            try:
+                scraped = await scrape_trial_page(nct_id)
+                if scraped.get("success"):
+                    return nct_id, scraped.get("markdown")
+            except Exception as e:
+                print(f"      ⚠️  Firecrawl enrichment failed for {nct_id}: {str(e)}")
+            return nct_id, None
+    
+    return [asyncio.create_task(enrich_one(nct_id)) for nct_id in nct_ids]
+
+
 async def run_crawl(
     condition: str,
     max_trials: int = 50,
@@ -189,9 +273,9 @@ async def run_crawl(
     Returns:
         Crawl statistics
     """
-    print("\n" + "═" * 60)
+    print("\n" + _BAR)
     print(f"  Crawling: {condition}")
-    print("═" * 60 + "\n")
+    print(_BAR + "\n")
     
     stats = {
         "condition": condition,
@@ -203,15 +287,29 @@ async def run_crawl(
         "start_time": datetime.utcnow(),
         "end_time": None
     }
+    started = time.perf_counter()
+    enrich_tasks = []
     
     try:
-        # Step 1: Fetch trials from API
+        # Step 1: Fetch trials from API (conditional on the last crawl's Last-Modified)
         print("📡 Step 1: Fetching from ClinicalTrials.gov API...")
-        result = await fetch_trials(
+        # Keyed on the enrich flag too, so a plain crawl's 304 can't skip a later enrichment
+        enrich_tag = "enriched" if enrich_with_firecrawl else "plain"
+        crawl_query = f"{normalize_condition(condition)}:{max_trials}:{enrich_tag}"
+        last_modified = None if force_refresh else await get_crawl_last_modified(crawl_query)
+        fetched = await fetch_all_trials_if_modified(
             condition=condition,
-            page_size=min(max_trials, 50)
+            max_trials=max_trials,
+            if_modified_since=last_modified
         )
-        raw_trials = result["trials"]
+        
+        if fetched["not_modified"]:
+            print("   ⏭️  Source unchanged since last crawl - skipping")
+            stats["not_modified"] = True
+            stats["end_time"] = datetime.utcnow()
+            return stats
+        
+        raw_trials = fetched["trials"]
         stats["total_fetched"] = len(raw_trials)
         
         if not raw_trials:
@@ -221,81 +319,107 @@ async def run_crawl(
         
         # Step 2: Get existing crawl records for deduplication
         print("\n🔍 Step 2: Checking for existing trials (deduplication)...")
-        existing_records = await get_all_crawl_records()
-        print(f"   Found {len(existing_records)} existing records in database")
+        existing_hashes = await get_crawl_record_hashes([raw_nct_id(r) for r in raw_trials])
+        print(f"   Found {len(existing_hashes)} existing records in database")
         
         # Step 3: Process each trial
         print("\n⚙️  Step 3: Processing trials...")
         trials_to_save = []
+        crawl_hashes = {}
         normalized_condition = normalize_condition(condition)
         
+        # Dedup on the raw payload so unchanged trials skip parsing entirely
+        pending = []
         for raw_trial in raw_trials:
-            parsed = parse_trial_data(raw_trial)
-            source_hash = hash_trial_data(parsed)
-            existing_record = existing_records.get(parsed["nct_id"])
+            source_hash = hash_raw_trial(raw_trial)
+            nct_id = raw_nct_id(raw_trial)
             
             # Check if we need to process this trial
-            if not force_refresh and existing_record and existing_record.get("source_hash") == source_hash:
+            if not force_refresh and existing_hashes.get(nct_id) == source_hash:
                 stats["skipped_trials"] += 1
                 continue
+            pending.append((raw_trial, nct_id, source_hash))
+        
+        # Kick off Firecrawl scrapes now so they run while trials are parsed
+        if enrich_with_firecrawl and pending:
+            print(f"   🔥 Enriching {len(pending)} trials with Firecrawl in the background...")
+            enrich_tasks = start_enrichment([nct_id for _, nct_id, _ in pending])
+            await asyncio.sleep(0)
+        
+        trials_by_id = {}
+        for processed, (raw_trial, nct_id, source_hash) in enumerate(pending, 1):
+            parsed = parse_trial_data(raw_trial)
             
-            is_new = existing_record is None
+            is_new = nct_id not in existing_hashes
             if is_new:
                 stats["new_trials"] += 1
             else:
                 stats["updated_trials"] += 1
             
-            icon = "🆕" if is_new else "🔄"
-            title_preview = parsed["title"][:50] if parsed.get("title") else "Unknown"
-            print(f"   {icon} {parsed['nct_id']}: {title_preview}...")
-            
-            # Enrich with Firecrawl if enabled
-            enriched_content = None
-            if enrich_with_firecrawl:
-                try:
-                    scraped = await scrape_trial_page(parsed["nct_id"])
-                    if scraped.get("success"):
-                        enriched_content = scraped.get("markdown")
-                except Exception as e:
-                    print(f"      ⚠️  Firecrawl enrichment failed: {str(e)}")
+            # Per-trial lines only at debug level; console writes add up on big crawls
+            if logger.isEnabledFor(logging.DEBUG):
+                icon = "🆕" if is_new else "🔄"
+                title_preview = parsed["title"][:50] if parsed.get("title") else "Unknown"
+                logger.debug(f"   {icon} {parsed['nct_id']}: {title_preview}...")
             
             # Generate markdown content
             markdown_content = generate_trial_markdown(parsed)
             
-            # Prepare trial document
-            trial_doc = {
-                **parsed,
-                "condition": normalized_condition,
-                "normalized_phase": normalize_phase(parsed.get("phase", "")),
-                "markdown_content": markdown_content,
-                "enriched_content": enriched_content,
-                "source_hash": source_hash
-            }
+            # Turn the freshly parsed dict into the trial document in place
+            parsed["condition"] = normalized_condition
+            parsed["normalized_phase"] = normalize_phase(parsed.get("phase", ""))
+            parsed["markdown_content"] = markdown_content
+            parsed["enriched_content"] = None
+            parsed["source_hash"] = source_hash
             
-            trials_to_save.append(trial_doc)
+            trials_to_save.append(parsed)
+            trials_by_id[nct_id] = parsed
+            crawl_hashes[parsed["nct_id"]] = source_hash
             
-            # Update crawl index
-            await update_crawl_record(parsed["nct_id"], source_hash)
+            if processed % _PROGRESS_EVERY == 0 or processed == len(pending):
+                print(
+                    f"   Processed {processed}/{len(pending)} trials "
+                    f"(new={stats['new_trials']}, updated={stats['updated_trials']})"
+                )
+                # Parsing is CPU-bound; let in-flight scrapes and requests progress
+                await asyncio.sleep(0)
+        
+        # Attach enrichment results as each scrape finishes
+        for next_done in asyncio.as_completed(enrich_tasks):
+            nct_id, enriched = await next_done
+            if enriched and nct_id in trials_by_id:
+                trials_by_id[nct_id]["enriched_content"] = enriched
         
         # Step 4: Save to MongoDB
         if trials_to_save:
             print(f"\n💾 Step 4: Saving {len(trials_to_save)} trials to MongoDB...")
             await save_trials(trials_to_save)
+            
+            # Update crawl index only once the trials are stored
+            await update_crawl_records(crawl_hashes)
             print("   ✅ Saved successfully")
         else:
             print("\n💾 Step 4: No new trials to save")
+        
+        # Remember the source's Last-Modified only once everything is stored
+        if fetched["last_modified"] or last_modified:
+            await set_crawl_last_modified(crawl_query, fetched["last_modified"])
     
     except Exception as e:
         print(f"\n❌ Crawl error: {str(e)}")
         stats["errors"].append(str(e))
+        
+        # Don't leave background scrapes running for a failed crawl
+        for task in enrich_tasks:
+            task.cancel()
     
     stats["end_time"] = datetime.utcnow()
-    duration = (stats["end_time"] - stats["start_time"]).total_seconds()
+    duration = time.perf_counter() - started
     
     # Print summary
-    print("\n" + "═" * 60)
+    print("\n" + _BAR)
     print("  CRAWL SUMMARY")
-    print("═" * 60)
+    print(_BAR)
     print(f"   Condition:     {condition}")
     print(f"   Total fetched: {stats['total_fetched']}")
     print(f"   New trials:    {stats['new_trials']}")
@@ -309,22 +433,25 @@ async def run_crawl(
 
 async def run_multi_crawl(
     conditions: List[str],
+    max_concurrent_conditions: int = 4,
     **kwargs
 ) -> List[Dict[str, Any]]:
     """
-    Run crawl for multiple conditions.
+    Run crawl for multiple conditions concurrently.
     
     Args:
         conditions: List of conditions to crawl
+        max_concurrent_conditions: Maximum conditions crawled at the same time
         **kwargs: Additional options passed to run_crawl
         
     Returns:
-        List of crawl results
+        List of crawl results, in the same order as conditions
     """
-    results = []
+    sem = asyncio.Semaphore(max_concurrent_conditions)
     
-    for condition in conditions:
-        result = await run_crawl(condition, **kwargs)
-        results.append(result)
+    async def crawl_one(condition: str) -> Dict[str, Any]:
+        async with sem:
+            return await run_crawl(condition, **kwargs)
     
-    return results
+    # run_crawl records its own errors in stats, so one failure can't cancel the rest
+    return await asyncio.gather(*[crawl_one(c) for c in conditions])
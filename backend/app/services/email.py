@@ -5,19 +5,64 @@ Sends clinical trial match notifications to patients and doctors.
 """
 
 import os
+import asyncio
 import logging
-from typing import List, Dict, Any, Optional
+from html import escape
+from typing import List, Dict, Any, Mapping, Optional, Tuple
 
 logger = logging.getLogger(__name__)
 
 # Check if resend is available
 try:
+    import requests
     import resend
     RESEND_AVAILABLE = True
 except ImportError:
     RESEND_AVAILABLE = False
     logger.warning("Resend package not installed. Email notifications disabled.")
 
+# Caps concurrent Resend calls when many notifications are queued at once
+_SEND_LIMIT = asyncio.Semaphore(4)
+
+# Resend accepts at most this many messages per batch request
+_BATCH_MAX = 100
+
+
+if RESEND_AVAILABLE:
+    class _SessionClient(resend.HTTPClient):
+        """Resend HTTP client that keeps one pooled session alive across sends."""
+        
+        def __init__(self, timeout: int = 30):
+            self._timeout = timeout
+            self._session = requests.Session()
+        
+        def request(
+            self,
+            method: str,
+            url: str,
+            headers: Mapping[str, str],
+            json: Optional[Any] = None,
+            files: Optional[Dict[str, Any]] = None,
+            data: Optional[Dict[str, str]] = None,
+        ) -> Tuple[bytes, int, Mapping[str, str]]:
+            try:
+                resp = self._session.request(
+                    method=method,
+                    url=url,
+                    headers=headers,
+                    json=json if files is None and data is None else None,
+                    files=files,
+                    data=data,
+                    timeout=self._timeout,
+                )
+                return resp.content, resp.status_code, resp.headers
+            except requests.RequestException as e:
+                raise RuntimeError(f"Request failed: {e}") from e
+    
+    # Configure the SDK once at import instead of on every send
+    resend.api_key = os.environ.get("RESEND_API_KEY")
+    resend.default_http_client = _SessionClient()
+
 
 def get_resend_config() -> tuple[Optional[str], str]:
     """Get Resend configuration from environment."""
@@ -31,30 +76,30 @@ def format_condition(condition: str) -> str:
     return condition.replace("_", " ").title()
 
 
+# (text color, background) per 20-point score bucket: <60 orange, 60-79 yellow, 80+ green
+_ORANGE = ("#f97316", "#ffedd5")
+_YELLOW = ("#eab308", "#fef9c3")
+_GREEN = ("#22c55e", "#dcfce7")
+_SCORE_STYLES = (_ORANGE, _ORANGE, _ORANGE, _YELLOW, _GREEN, _GREEN)
+
+
 def build_email_html(patient: Dict[str, Any], matches: List[Dict[str, Any]]) -> str:
     """Build a professional HTML email template."""
     
-    patient_name = patient.get("name", "Patient")
-    condition = format_condition(patient.get("condition", "Unknown"))
+    # Escape patient and agent-supplied text before it goes into markup
+    patient_name = escape(patient.get("name", "Patient"))
+    condition = escape(format_condition(patient.get("condition", "Unknown")))
     
     # Build match cards HTML
     match_cards = ""
     for i, match in enumerate(matches[:3], 1):
-        nct_id = match.get("nct_id", "Unknown")
-        title = match.get("trial_title") or nct_id
+        nct_id = escape(match.get("nct_id", "Unknown"))
+        title = escape(match.get("trial_title") or nct_id)
         score = match.get("match_score", 0)
         reasoning = match.get("reasoning", "")
         
         # Score color
-        if score >= 80:
-            score_color = "#22c55e"  # green
-            score_bg = "#dcfce7"
-        elif score >= 60:
-            score_color = "#eab308"  # yellow
-            score_bg = "#fef9c3"
-        else:
-            score_color = "#f97316"  # orange
-            score_bg = "#ffedd5"
+        score_color, score_bg = _SCORE_STYLES[min(max(int(score), 0), 100) // 20]
         
         match_cards += f"""
         <div style="background: #f8fafc; border-radius: 8px; padding: 16px; margin-bottom: 12px; border-left: 4px solid {score_color};">
@@ -66,7 +111,7 @@ def build_email_html(patient: Dict[str, Any], matches: List[Dict[str, Any]]) ->
             </div>
             <h3 style="margin: 0 0 4px 0; font-size: 16px; color: #1e293b;">{title}</h3>
             <p style="margin: 0 0 8px 0; font-size: 13px; color: #64748b;">Trial ID: {nct_id}</p>
-            {f'<p style="margin: 0; font-size: 14px; color: #475569; line-height: 1.5;">{reasoning[:300]}{"..." if len(reasoning) > 300 else ""}</p>' if reasoning else ''}
+            {f'<p style="margin: 0; font-size: 14px; color: #475569; line-height: 1.5;">{escape(reasoning[:300])}{"..." if len(reasoning) > 300 else ""}</p>' if reasoning else ''}
             <a href="https://clinicaltrials.gov/study/{nct_id}" style="display: inline-block; margin-top: 12px; color: #2563eb; font-size: 13px; text-decoration: none;">View on ClinicalTrials.gov →</a>
         </div>
         """
@@ -155,9 +200,108 @@ def build_plain_text(patient: Dict[str, Any], matches: List[Dict[str, Any]]) ->
     return "\n".join(lines)
 
 
+def _response_ids(response: Any) -> List[str]:
+    """Extract message IDs from a single or batch Resend response."""
+    if isinstance(response, dict):
+        if "data" in response:
+            return [item.get("id", "") for item in response["data"] or []]
+        return [response.get("id", "")]
+    return [str(response)]
+
+
+async def _send_messages(messages: List[Dict[str, Any]]) -> List[str]:
+    """
+    Send one or more Resend messages with as few API calls as possible.
+    
+    A single message (which may have several shared recipients) goes through
+    Emails.send; multiple distinct messages go through Batch.send, up to
+    100 per request.
+    
+    Args:
+        messages: Resend send params, each with its own to/subject/html
+        
+    Returns:
+        Resend message IDs in send order
+    """
+    # The SDK calls are blocking; run them off the event loop
+    async with _SEND_LIMIT:
+        if len(messages) == 1:
+            response = await asyncio.to_thread(resend.Emails.send, messages[0])
+            return _response_ids(response)
+        
+        ids = []
+        for start in range(0, len(messages), _BATCH_MAX):
+            chunk = messages[start:start + _BATCH_MAX]
+            response = await asyncio.to_thread(resend.Batch.send, chunk)
+            ids.extend(_response_ids(response))
+        return ids
+
+
+def _collect_recipients(patient: Dict[str, Any]) -> List[str]:
+    """Get the doctor and patient addresses for a notification, deduplicated."""
+    to_emails = []
+    if patient.get("doctor_email"):
+        to_emails.append(patient["doctor_email"])
+    if patient.get("email") and patient.get("email") not in to_emails:
+        to_emails.append(patient["email"])
+    return to_emails
+
+
+def _build_message(
+    patient: Dict[str, Any],
+    matches: List[Dict[str, Any]],
+    from_email: str,
+    to_emails: List[str]
+) -> Dict[str, Any]:
+    """Build the Resend send params for one patient's match notification."""
+    patient_name = patient.get("name", "Patient")
+    condition = format_condition(patient.get("condition", "Unknown"))
+    
+    # Doctor and patient get identical content, so one message covers both
+    return {
+        "from": from_email,
+        "to": to_emails,
+        "subject": f"MatchPoint: Clinical Trial Matches for {patient_name} ({condition})",
+        "html": build_email_html(patient, matches),
+        "text": build_plain_text(patient, matches),
+    }
+
+
+def _resolve_config(
+    api_key: Optional[str],
+    from_email: Optional[str]
+) -> Tuple[Optional[str], Optional[str], Optional[str]]:
+    """
+    Resolve Resend credentials and point the SDK at them.
+    
+    Returns:
+        Tuple of (api_key, from_email, error); error is None when sending is possible
+    """
+    if not RESEND_AVAILABLE:
+        logger.warning("Cannot send email: Resend not installed")
+        return None, None, "Resend package not installed"
+    
+    if not api_key or not from_email:
+        env_api_key, env_from_email = get_resend_config()
+        api_key = api_key or env_api_key
+        from_email = from_email or env_from_email
+    
+    if not api_key:
+        logger.warning("Cannot send email: RESEND_API_KEY not set")
+        return None, None, "RESEND_API_KEY not configured"
+    
+    # Only touch the global SDK key when the caller passes a different one
+    if resend.api_key != api_key:
+        resend.api_key = api_key
+    
+    return api_key, from_email, None
+
+
 async def send_match_notification(
     patient: Dict[str, Any],
-    matches: List[Dict[str, Any]]
+    matches: List[Dict[str, Any]],
+    api_key: Optional[str] = None,
+    from_email: Optional[str] = None
 ) -> Dict[str, Any]:
     """
     Send match notification email to patient and/or doctor.
@@ -165,6 +309,8 @@ async def send_match_notification(
     Args:
         patient: Patient data including email and doctor_email
         matches: List of trial matches
+        api_key: Resend API key (defaults to RESEND_API_KEY)
+        from_email: Sender address (defaults to RESEND_FROM_EMAIL)
         
     Returns:
         Dict with success status and details
@@ -175,58 +321,30 @@ async def send_match_notification(
         "error": None,
     }
     
-    # Check if Resend is available
-    if not RESEND_AVAILABLE:
-        result["error"] = "Resend package not installed"
-        logger.warning("Cannot send email: Resend not installed")
+    api_key, from_email, error = _resolve_config(api_key, from_email)
+    if error:
+        result["error"] = error
         return result
     
-    # Get configuration
-    api_key, from_email = get_resend_config()
-    
-    if not api_key:
-        result["error"] = "RESEND_API_KEY not configured"
-        logger.warning("Cannot send email: RESEND_API_KEY not set")
-        return result
-    
-    # Set API key
-    resend.api_key = api_key
-    
-    # Collect recipients
-    to_emails = []
-    if patient.get("doctor_email"):
-        to_emails.append(patient["doctor_email"])
-    if patient.get("email") and patient.get("email") not in to_emails:
-        to_emails.append(patient["email"])
-    
+    to_emails = _collect_recipients(patient)
     if not to_emails:
         result["error"] = "No recipient email addresses"
         logger.info("Cannot send email: No recipient addresses for patient")
         return result
     
-    # Build email content
-    html_content = build_email_html(patient, matches)
-    text_content = build_plain_text(patient, matches)
-    
+    message = _build_message(patient, matches, from_email, to_emails)
     patient_name = patient.get("name", "Patient")
-    condition = format_condition(patient.get("condition", "Unknown"))
     
     try:
         print(f"📧 Attempting to send email to: {to_emails}")
         print(f"   From: {from_email}")
-        print(f"   Subject: MatchPoint - Clinical Trial Matches for {patient_name} ({condition})")
+        print(f"   Subject: {message['subject']}")
         
-        response = resend.Emails.send({
-            "from": from_email,
-            "to": to_emails,
-            "subject": f"MatchPoint: Clinical Trial Matches for {patient_name} ({condition})",
-            "html": html_content,
-            "text": text_content,
-        })
+        ids = await _send_messages([message])
         
         result["sent"] = True
         result["recipients"] = to_emails
-        result["resend_id"] = response.get("id") if isinstance(response, dict) else str(response)
+        result["resend_id"] = ids[0] if ids else None
         
         print(f"✉️  Email sent successfully! Resend ID: {result['resend_id']}")
         logger.info(f"✉️  Email sent to {to_emails} for patient {patient_name}")
@@ -237,3 +355,70 @@ async def send_match_notification(
         logger.error(f"❌ Failed to send email: {e}")
     
     return result
+
+
+async def send_match_notifications_bulk(
+    patients_and_matches: List[Tuple[Dict[str, Any], List[Dict[str, Any]]]],
+    api_key: Optional[str] = None,
+    from_email: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    """
+    Send match notification emails for many patients at once.
+    
+    Messages go out through Resend's batch endpoint (up to 100 per API call)
+    instead of one call per patient.
+    
+    Args:
+        patients_and_matches: List of (patient, matches) pairs
+        api_key: Resend API key (defaults to RESEND_API_KEY)
+        from_email: Sender address (defaults to RESEND_FROM_EMAIL)
+        
+    Returns:
+        One result dict per input pair, in input order (same shape as
+        send_match_notification)
+    """
+    results = [
+        {"sent": False, "recipients": [], "error": None}
+        for _ in patients_and_matches
+    ]
+    
+    api_key, from_email, error = _resolve_config(api_key, from_email)
+    if error:
+        for result in results:
+            result["error"] = error
+        return results
+    
+    # Build every message up front; patients without addresses are skipped
+    pending = []
+    messages = []
+    for result, (patient, matches) in zip(results, patients_and_matches):
+        to_emails = _collect_recipients(patient)
+        if not to_emails:
+            result["error"] = "No recipient email addresses"
+            continue
+        result["recipients"] = to_emails
+        pending.append(result)
+        messages.append(_build_message(patient, matches, from_email, to_emails))
+    
+    if not messages:
+        return results
+    
+    try:
+        print(f"📧 Sending {len(messages)} match notification emails")
+        ids = await _send_messages(messages)
+        
+        for result, resend_id in zip(pending, ids):
+            result["sent"] = True
+            result["resend_id"] = resend_id
+        
+        print(f"✉️  Sent {len(ids)} emails")
+        logger.info(f"✉️  Sent {len(ids)} match notification emails")
+        
+    except Exception as e:
+        for result in pending:
+            result["error"] = str(e)
+            result["recipients"] = []
+        print(f"❌ Failed to send emails: {e}")
+        logger.error(f"❌ Failed to send bulk emails: {e}")
+    
+    return results
@@ -5,12 +5,29 @@ Handles web scraping and content extraction using Firecrawl.
 Used to enrich trial data with additional information not available in the API.
 """
 
+import asyncio
+import random
+import time
 from typing import Optional, Dict, Any, List
 from datetime import datetime
-from firecrawl import FirecrawlApp
 
-# Global Firecrawl client
-_firecrawl_client: Optional[FirecrawlApp] = None
+import httpx
+import orjson
+
+# Firecrawl REST API (v1)
+FIRECRAWL_API = "https://api.firecrawl.dev/v1"
+
+# Shared HTTP/2 client (one multiplexed connection serves concurrent scrapes)
+_firecrawl_client: Optional[httpx.AsyncClient] = None
+
+# Retry policy for throttled (429) and transient (5xx / network) failures
+_MAX_ATTEMPTS = 5
+_BACKOFF_BASE = 1.0
+_BACKOFF_MAX = 30.0
+_RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+# Loop time until which every request holds off, shared by concurrent scrapes
+_throttled_until = 0.0
 
 
 def init_firecrawl(api_key: str) -> None:
@@ -25,17 +42,111 @@ def init_firecrawl(api_key: str) -> None:
     if not api_key:
         raise ValueError("FIRECRAWL_API_KEY is required")
     
-    _firecrawl_client = FirecrawlApp(api_key=api_key)
+    # Scrapes render the page server-side, so allow a generous read timeout.
+    # HTTP/2 is negotiated via ALPN and falls back to keep-alive HTTP/1.1.
+    _firecrawl_client = httpx.AsyncClient(
+        base_url=FIRECRAWL_API,
+        headers={"Authorization": f"Bearer {api_key}"},
+        http2=True,
+        timeout=httpx.Timeout(60.0, connect=5.0),
+        limits=httpx.Limits(max_connections=50, max_keepalive_connections=50, keepalive_expiry=75.0)
+    )
     print("🔥 Firecrawl client initialized")
 
 
-def get_firecrawl_client() -> FirecrawlApp:
+def get_firecrawl_client() -> httpx.AsyncClient:
     """Get the Firecrawl client instance."""
     if _firecrawl_client is None:
         raise RuntimeError("Firecrawl not initialized. Call init_firecrawl() first.")
     return _firecrawl_client
 
 
+async def close_firecrawl() -> None:
+    """Close the Firecrawl HTTP client and its pooled connections."""
+    global _firecrawl_client
+    
+    if _firecrawl_client is not None:
+        await _firecrawl_client.aclose()
+        _firecrawl_client = None
+
+
+def _retry_after(response: httpx.Response) -> Optional[float]:
+    """
+    Get how long the API asked us to wait, in seconds.
+    
+    Reads Retry-After, or X-RateLimit-Reset once X-RateLimit-Remaining hits 0
+    (accepting either a delay in seconds or an epoch timestamp).
+    """
+    headers = response.headers
+    value = headers.get("Retry-After")
+    if value is None and headers.get("X-RateLimit-Remaining") == "0":
+        value = headers.get("X-RateLimit-Reset")
+    if value is None:
+        return None
+    
+    try:
+        seconds = float(value)
+    except ValueError:
+        return None
+    
+    # Large values are absolute Unix timestamps
+    if seconds > 1e9:
+        seconds -= time.time()
+    return min(max(seconds, 0.0), _BACKOFF_MAX)
+
+
+def _backoff(attempt: int) -> float:
+    """Exponential backoff with full jitter for the given attempt (1-based)."""
+    return random.uniform(0, min(_BACKOFF_MAX, _BACKOFF_BASE * 2 ** attempt))
+
+
+async def _post(path: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    POST to a Firecrawl endpoint and return the decoded response body.
+    
+    Throttled and transient failures are retried with backoff, honoring the
+    API's rate-limit headers; a rate limit seen by one request pauses all.
+    
+    Raises:
+        httpx.HTTPStatusError: On a non-2xx response that is not retried, or
+            once attempts run out
+        RuntimeError: If Firecrawl reports the request as unsuccessful
+    """
+    global _throttled_until
+    loop = asyncio.get_running_loop()
+    client = get_firecrawl_client()
+    
+    for attempt in range(1, _MAX_ATTEMPTS + 1):
+        wait = _throttled_until - loop.time()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        
+        try:
+            response = await client.post(path, json=payload)
+        except httpx.TransportError:
+            if attempt == _MAX_ATTEMPTS:
+                raise
+            await asyncio.sleep(_backoff(attempt))
+            continue
+        
+        delay = _retry_after(response)
+        if delay:
+            _throttled_until = max(_throttled_until, loop.time() + delay)
+        
+        if response.status_code in _RETRY_STATUSES and attempt < _MAX_ATTEMPTS:
+            print(f"   Firecrawl returned {response.status_code}, retrying (attempt {attempt}/{_MAX_ATTEMPTS})")
+            if not delay:
+                await asyncio.sleep(_backoff(attempt))
+            continue
+        
+        response.raise_for_status()
+        body = orjson.loads(response.content)
+        
+        if not body.get("success"):
+            raise RuntimeError(body.get("error") or f"Firecrawl {path} failed")
+        return body
+
+
 async def scrape_url(url: str, options: Optional[Dict] = None) -> Dict[str, Any]:
     """
     Scrape a URL and return markdown content.
@@ -47,16 +158,15 @@ async def scrape_url(url: str, options: Optional[Dict] = None) -> Dict[str, Any]
     Returns:
         Scraped content with markdown
     """
-    client = get_firecrawl_client()
-    
     print(f"🔥 Scraping: {url}")
     
     try:
-        scrape_options = {"formats": ["markdown"]}
+        scrape_options = {"url": url, "formats": ["markdown"]}
         if options:
             scrape_options.update(options)
         
-        result = client.scrape_url(url, scrape_options)
+        body = await _post("/scrape", scrape_options)
+        result = body.get("data") or {}
         
         return {
             "success": True,
@@ -89,43 +199,48 @@ async def scrape_trial_page(nct_id: str) -> Dict[str, Any]:
     return await scrape_url(url)
 
 
-async def batch_scrape(urls: List[str], concurrency: int = 2) -> List[Dict[str, Any]]:
+async def batch_scrape(
+    urls: List[str],
+    concurrency: int = 2,
+    requests_per_second: Optional[float] = None
+) -> List[Dict[str, Any]]:
     """
     Batch scrape multiple URLs.
     
+    Up to `concurrency` scrapes run at once; a new one starts as soon as a
+    slot frees up instead of waiting for the slowest URL in a fixed batch.
+    
     Args:
         urls: Array of URLs to scrape
         concurrency: Number of concurrent scrapes
+        requests_per_second: Maximum scrape start rate (defaults to concurrency)
         
     Returns:
-        Array of scraped results
+        Array of scraped results, in the same order as urls
     """
-    import asyncio
+    sem = asyncio.Semaphore(concurrency)
     
-    results = []
+    # Space out request starts to respect rate limits
+    interval = 1.0 / (requests_per_second or concurrency)
+    pacing = asyncio.Lock()
+    next_start = 0.0
     
-    # Process in batches to respect rate limits
-    for i in range(0, len(urls), concurrency):
-        batch = urls[i:i + concurrency]
-        batch_results = await asyncio.gather(
-            *[scrape_url(url) for url in batch],
-            return_exceptions=True
-        )
-        
-        for result in batch_results:
-            if isinstance(result, Exception):
-                results.append({
-                    "success": False,
-                    "error": str(result)
-                })
-            else:
-                results.append(result)
-        
-        # Small delay between batches
-        if i + concurrency < len(urls):
-            await asyncio.sleep(1)
+    async def scrape_one(url: str) -> Dict[str, Any]:
+        nonlocal next_start
+        async with sem:
+            async with pacing:
+                now = asyncio.get_running_loop().time()
+                if next_start > now:
+                    await asyncio.sleep(next_start - now)
+                next_start = max(now, next_start) + interval
+            return await scrape_url(url)
+    
+    results = await asyncio.gather(*[scrape_one(url) for url in urls], return_exceptions=True)
     
-    return results
+    return [
+        {"success": False, "error": str(result)} if isinstance(result, Exception) else result
+        for result in results
+    ]
 
 
 async def search_web(query: str, limit: int = 5) -> Dict[str, Any]:
@@ -139,12 +254,11 @@ async def search_web(query: str, limit: int = 5) -> Dict[str, Any]:
     Returns:
         Search results
     """
-    client = get_firecrawl_client()
-    
     print(f"🔍 Searching: {query}")
     
     try:
-        result = client.search(query, {
+        result = await _post("/search", {
+            "query": query,
             "limit": limit,
             "scrapeOptions": {
                 "formats": ["markdown"]
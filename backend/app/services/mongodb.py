@@ -5,23 +5,45 @@ Handles database connections and operations for clinical trial data.
 Uses Motor for async MongoDB operations.
 """
 
-from typing import Optional, Dict, Any, List
+import os
+import asyncio
+from typing import Optional, Dict, Any, AsyncIterator, List, Tuple
 from datetime import datetime
+import orjson
+import xxhash
 from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from pymongo import ASCENDING, DESCENDING, IndexModel, ReturnDocument, UpdateOne
 from bson import ObjectId
 
 # Global MongoDB client and database
 _client: Optional[AsyncIOMotorClient] = None
 _db: Optional[AsyncIOMotorDatabase] = None
 
+# Default pool ceiling: 5 connections per CPU, never fewer than 20
+DEFAULT_MAX_POOL_SIZE = max(20, (os.cpu_count() or 1) * 5)
 
-async def connect_mongodb(uri: str, db_name: str = "clinical_trials") -> AsyncIOMotorDatabase:
+# In-flight single-trial lookups keyed by (nct_id, projection)
+_trial_lookups: Dict[Tuple[str, Any], "asyncio.Future"] = {}
+
+
+async def connect_mongodb(
+    uri: str,
+    db_name: str = "clinical_trials",
+    max_pool_size: Optional[int] = None,
+    min_pool_size: int = 10,
+    init_indexes: bool = True
+) -> AsyncIOMotorDatabase:
     """
     Connect to MongoDB.
     
     Args:
         uri: MongoDB connection string
         db_name: Database name
+        max_pool_size: Maximum connections per server (defaults to DEFAULT_MAX_POOL_SIZE)
+        min_pool_size: Connections opened eagerly and kept warm (capped at
+            the max pool size)
+        init_indexes: Create indexes after connecting (skip when they are
+            managed at deploy time, see app.scripts.create_indexes)
         
     Returns:
         Database instance
@@ -31,7 +53,21 @@ async def connect_mongodb(uri: str, db_name: str = "clinical_trials") -> AsyncIO
     if not uri:
         raise ValueError("MONGODB_URI is required")
     
-    _client = AsyncIOMotorClient(uri)
+    # The driver rejects minPoolSize > maxPoolSize, so a small max caps the min
+    max_pool_size = max_pool_size or DEFAULT_MAX_POOL_SIZE
+    
+    _client = AsyncIOMotorClient(
+        uri,
+        maxPoolSize=max_pool_size,
+        minPoolSize=min(min_pool_size, max_pool_size),
+        # Bound the wait for a pooled connection, but leave room for bulk
+        # crawls that briefly hold most of the pool
+        waitQueueTimeoutMS=10000,
+        serverSelectionTimeoutMS=5000,
+        # Trial documents are mostly text; compress on the wire (negotiated
+        # with the server, zlib is the fallback when zstandard is missing)
+        compressors="zstd,zlib"
+    )
     _db = _client[db_name]
     
     # Test connection
@@ -39,11 +75,34 @@ async def connect_mongodb(uri: str, db_name: str = "clinical_trials") -> AsyncIO
     print(f"🍃 Connected to MongoDB: {db_name}")
     
     # Create indexes
-    await create_indexes()
+    if init_indexes:
+        await create_indexes()
     
     return _db
 
 
+async def warm_mongodb_pool(connections: Optional[int] = None) -> None:
+    """
+    Open pooled connections up front so early requests skip the handshake.
+    
+    Concurrent pings make the pool open new connections (up to the given
+    count, as the driver limits how many it establishes at once); sequential
+    pings would all reuse the same socket.
+    
+    Args:
+        connections: Number of connections to open (defaults to the
+            client's minPoolSize)
+    """
+    if _client is None:
+        return
+    if connections is None:
+        connections = _client.options.pool_options.min_pool_size
+    if connections <= 0:
+        return
+    
+    await asyncio.gather(*[_client.admin.command("ping") for _ in range(connections)])
+
+
 def get_db() -> AsyncIOMotorDatabase:
     """Get the database instance."""
     if _db is None:
@@ -62,48 +121,89 @@ async def close_mongodb() -> None:
 
 
 async def create_indexes() -> None:
-    """Create necessary indexes for performance."""
+    """
+    Create necessary indexes for performance.
+    
+    Idempotent. Each collection's indexes go out as one createIndexes
+    command, and the collections are done concurrently.
+    """
     db = get_db()
     
     # Trials collection indexes
-    await db.trials.create_index("nct_id", unique=True)
-    await db.trials.create_index([("condition", 1), ("phase", 1)])
-    await db.trials.create_index("status")
-    await db.trials.create_index("last_updated", sparse=True)
-    
-    # Crawl index collection
-    await db.crawl_index.create_index("nct_id", unique=True)
-    
-    # Patients collection indexes - Core
-    await db.patients.create_index("email", unique=True, sparse=True)
-    await db.patients.create_index("condition")
-    await db.patients.create_index("synthea_id", unique=True, sparse=True)
-    
-    # Patients collection indexes - Extended (for efficient querying)
-    await db.patients.create_index("active_condition_codes")  # Array index for SNOMED matching
-    await db.patients.create_index("active_medication_codes")  # Array index for RxNorm matching
-    await db.patients.create_index("sex")
-    await db.patients.create_index("location.state")
-    await db.patients.create_index("primary_diagnosis.snomed_code", sparse=True)
-    await db.patients.create_index("treatments.biologic_naive", sparse=True)
-    await db.patients.create_index("data_source")
-    
-    # Compound index for common queries
-    await db.patients.create_index([
-        ("condition", 1),
-        ("location.state", 1),
-        ("treatments.biologic_naive", 1)
-    ])
+    trials = [
+        IndexModel("nct_id", unique=True),
+        IndexModel([("condition", ASCENDING), ("phase", ASCENDING)]),
+        IndexModel([("condition", ASCENDING), ("status", ASCENDING)]),
+        IndexModel([("condition", ASCENDING), ("last_updated", DESCENDING)]),
+        IndexModel("status"),
+        IndexModel("last_updated", sparse=True),
+    ]
+    
+    # Crawl index collections
+    crawl_index = [IndexModel("nct_id", unique=True)]
+    crawl_queries = [IndexModel("query", unique=True)]
+    
+    patients = [
+        # Core
+        IndexModel("email", unique=True, sparse=True),
+        IndexModel("condition"),
+        IndexModel("synthea_id", unique=True, sparse=True),
+        
+        # Extended (for efficient querying)
+        IndexModel("active_condition_codes"),  # Array index for SNOMED matching
+        IndexModel("active_medication_codes"),  # Array index for RxNorm matching
+        IndexModel("sex"),
+        IndexModel("location.state"),
+        IndexModel("primary_diagnosis.snomed_code", sparse=True),
+        IndexModel("treatments.biologic_naive", sparse=True),
+        IndexModel("data_source"),
+        
+        # Compound index for common queries
+        IndexModel([
+            ("condition", ASCENDING),
+            ("location.state", ASCENDING),
+            ("treatments.biologic_naive", ASCENDING)
+        ]),
+    ]
     
     # Matches collection indexes
-    await db.matches.create_index([("patient_id", 1), ("created_at", -1)])
-    await db.matches.create_index("nct_id")
+    matches = [
+        IndexModel([("patient_id", ASCENDING), ("created_at", DESCENDING)]),
+        IndexModel([("patient_id", ASCENDING), ("match_score", DESCENDING)]),  # get_matches_by_patient sort
+        IndexModel("nct_id"),
+    ]
+    
+    await asyncio.gather(
+        db.trials.create_indexes(trials),
+        db.crawl_index.create_indexes(crawl_index),
+        db.crawl_queries.create_indexes(crawl_queries),
+        db.patients.create_indexes(patients),
+        db.matches.create_indexes(matches),
+    )
     
     print("   📇 Indexes created")
 
 
 # ============ Trial Operations ============
 
+# Bookkeeping fields left out of a trial's content hash
+_UNHASHED_TRIAL_FIELDS = frozenset({"_id", "created_at", "updated_at", "content_hash"})
+
+
+def trial_content_hash(trial: Dict[str, Any]) -> str:
+    """
+    Hash a trial document's stored content (key order independent).
+    
+    Args:
+        trial: Trial document
+        
+    Returns:
+        xxHash64 hex digest
+    """
+    content = {k: v for k, v in trial.items() if k not in _UNHASHED_TRIAL_FIELDS}
+    return xxhash.xxh64_hexdigest(orjson.dumps(content, option=orjson.OPT_SORT_KEYS, default=str))
+
+
 async def save_trial(trial: Dict[str, Any]) -> Any:
     """
     Save a trial to the database (upsert).
@@ -116,6 +216,7 @@ async def save_trial(trial: Dict[str, Any]) -> Any:
     """
     db = get_db()
     
+    trial["content_hash"] = trial_content_hash(trial)
     trial["updated_at"] = datetime.utcnow()
     
     result = await db.trials.update_one(
@@ -134,65 +235,170 @@ async def save_trials(trials: List[Dict[str, Any]]) -> Any:
     """
     Save multiple trials (bulk upsert).
     
+    Trials whose content hash matches the stored document are skipped, so
+    re-saving unchanged data costs one projected read instead of a write
+    (and oplog entry) per trial.
+    
     Args:
         trials: List of trial data
         
     Returns:
-        Bulk write result
+        Bulk write result, or None if nothing needed writing
     """
+    if not trials:
+        return None
+    
     db = get_db()
     
-    from pymongo import UpdateOne
+    hashes = [trial_content_hash(trial) for trial in trials]
+    cursor = db.trials.find(
+        {"nct_id": {"$in": [trial["nct_id"] for trial in trials]}},
+        {"nct_id": 1, "content_hash": 1, "_id": 0}
+    )
+    stored = {d["nct_id"]: d.get("content_hash") async for d in cursor}
+    
+    # One timestamp and insert-only payload, shared by the whole batch
+    now = datetime.utcnow()
+    set_on_insert = {"created_at": now}
     
     operations = []
-    for trial in trials:
-        trial["updated_at"] = datetime.utcnow()
+    for trial, content_hash in zip(trials, hashes):
+        if stored.get(trial["nct_id"]) == content_hash:
+            continue
+        
+        trial["content_hash"] = content_hash
+        trial["updated_at"] = now
         operations.append(
             UpdateOne(
                 {"nct_id": trial["nct_id"]},
-                {
-                    "$set": trial,
-                    "$setOnInsert": {"created_at": datetime.utcnow()}
-                },
+                {"$set": trial, "$setOnInsert": set_on_insert},
                 upsert=True
             )
         )
     
     if operations:
-        result = await db.trials.bulk_write(operations)
+        # Upserts are independent; unordered lets the server apply them in parallel
+        result = await db.trials.bulk_write(operations, ordered=False)
         return result
     
     return None
 
 
-async def get_trial_by_nct_id(nct_id: str) -> Optional[Dict]:
-    """Get a trial by NCT ID."""
+async def get_trial_by_nct_id(nct_id: str, projection: Optional[Dict[str, int]] = None) -> Optional[Dict]:
+    """
+    Get a trial by NCT ID, optionally returning only projected fields.
+    
+    Concurrent lookups for the same trial and projection share a single
+    query, so a burst of identical requests costs one round-trip. Nothing is
+    kept once the query completes, so results are never stale. Each caller
+    gets its own shallow copy of the document.
+    """
+    key = (nct_id, tuple(sorted(projection.items())) if projection else None)
+    
+    lookup = _trial_lookups.get(key)
+    if lookup is None:
+        db = get_db()
+        lookup = asyncio.ensure_future(db.trials.find_one({"nct_id": nct_id}, projection))
+        _trial_lookups[key] = lookup
+        lookup.add_done_callback(lambda _: _trial_lookups.pop(key, None))
+    
+    # Shield so one cancelled request doesn't cancel the query for the others
+    trial = await asyncio.shield(lookup)
+    return dict(trial) if trial is not None else None
+
+
+async def get_trials_by_nct_ids(
+    nct_ids: List[str],
+    projection: Optional[Dict[str, int]] = None
+) -> Dict[str, Dict]:
+    """
+    Get several trials by NCT ID in a single query.
+    
+    Args:
+        nct_ids: NCT identifiers to fetch
+        projection: Fields to include/exclude (must keep nct_id)
+        
+    Returns:
+        Dict of nct_id to trial; IDs that were not found are absent
+    """
     db = get_db()
-    return await db.trials.find_one({"nct_id": nct_id})
+    cursor = db.trials.find({"nct_id": {"$in": nct_ids}}, projection)
+    return {d["nct_id"]: d async for d in cursor}
 
 
-async def get_trials_by_condition(
+def _trials_by_condition_cursor(
     condition: str,
-    status: Optional[str] = None,
-    limit: int = 100
-) -> List[Dict]:
-    """Get trials by condition."""
+    status: Optional[str],
+    limit: int,
+    projection: Optional[Dict[str, int]]
+) -> Any:
+    """Build the cursor shared by get_trials_by_condition and iter_trials_by_condition."""
     db = get_db()
     
-    # Case-insensitive regex match
-    query = {"condition": {"$regex": condition, "$options": "i"}}
+    query = {"condition": condition}
     
     if status:
         query["status"] = status
     
-    cursor = db.trials.find(query).sort("last_updated", -1).limit(limit)
+    return db.trials.find(query, projection).sort("last_updated", -1).limit(limit)
+
+
+async def get_trials_by_condition(
+    condition: str,
+    status: Optional[str] = None,
+    limit: int = 100,
+    projection: Optional[Dict[str, int]] = None
+) -> List[Dict]:
+    """
+    Get trials by condition, optionally returning only projected fields.
+    
+    Args:
+        condition: Normalized condition name, as stored by the crawler
+            (see crawler.normalize_condition); matched exactly so the
+            condition indexes are used
+        status: Only return trials with this status
+        limit: Maximum results
+        projection: Fields to include/exclude
+        
+    Returns:
+        Trials, most recently updated first
+    """
+    cursor = _trials_by_condition_cursor(condition, status, limit, projection)
     return await cursor.to_list(length=limit)
 
 
-async def get_all_trials(limit: int = 1000) -> List[Dict]:
-    """Get all trials."""
+async def iter_trials_by_condition(
+    condition: str,
+    status: Optional[str] = None,
+    limit: int = 100,
+    projection: Optional[Dict[str, int]] = None,
+    batch_size: int = 100
+) -> AsyncIterator[Dict]:
+    """
+    Stream trials by condition, yielding each as its batch arrives.
+    
+    Same query as get_trials_by_condition, for callers that only need one
+    pass and can start work before the last batch is fetched.
+    
+    Args:
+        condition: Normalized condition name, as stored by the crawler
+        status: Only return trials with this status
+        limit: Maximum results
+        projection: Fields to include/exclude
+        batch_size: Documents fetched per round-trip
+        
+    Yields:
+        Trials, most recently updated first
+    """
+    cursor = _trials_by_condition_cursor(condition, status, limit, projection)
+    async for trial in cursor.batch_size(batch_size):
+        yield trial
+
+
+async def get_all_trials(limit: int = 1000, projection: Optional[Dict[str, int]] = None) -> List[Dict]:
+    """Get all trials, optionally returning only projected fields."""
     db = get_db()
-    cursor = db.trials.find({}).sort("last_updated", -1).limit(limit)
+    cursor = db.trials.find({}, projection).sort("last_updated", -1).limit(limit)
     return await cursor.to_list(length=limit)
 
 
@@ -225,9 +431,26 @@ async def get_crawl_record(nct_id: str) -> Optional[Dict]:
 async def get_all_crawl_records() -> Dict[str, Dict]:
     """Get all crawl records as a dict keyed by nct_id."""
     db = get_db()
-    cursor = db.crawl_index.find({})
-    records = await cursor.to_list(length=10000)
-    return {r["nct_id"]: r for r in records}
+    cursor = db.crawl_index.find(
+        {}, {"nct_id": 1, "source_hash": 1, "last_scraped": 1, "_id": 0}
+    ).batch_size(1000)
+    return {r["nct_id"]: r async for r in cursor}
+
+
+async def get_crawl_record_hashes(nct_ids: Optional[List[str]] = None) -> Dict[str, str]:
+    """
+    Get stored source hashes keyed by nct_id.
+    
+    Args:
+        nct_ids: Only look up these trials (all records if None)
+        
+    Returns:
+        Dict of nct_id to source_hash
+    """
+    db = get_db()
+    query = {"nct_id": {"$in": nct_ids}} if nct_ids is not None else {}
+    cursor = db.crawl_index.find(query, {"nct_id": 1, "source_hash": 1, "_id": 0})
+    return {d["nct_id"]: d.get("source_hash") async for d in cursor}
 
 
 async def update_crawl_record(nct_id: str, source_hash: str) -> None:
@@ -246,10 +469,62 @@ async def update_crawl_record(nct_id: str, source_hash: str) -> None:
     )
 
 
+async def update_crawl_records(source_hashes: Dict[str, str]) -> Any:
+    """
+    Update many crawl records in a single bulk write.
+    
+    Args:
+        source_hashes: Mapping of nct_id to its new source hash
+        
+    Returns:
+        Bulk write result, or None if there was nothing to write
+    """
+    if not source_hashes:
+        return None
+    
+    db = get_db()
+    now = datetime.utcnow()
+    
+    operations = [
+        UpdateOne(
+            {"nct_id": nct_id},
+            {"$set": {"source_hash": source_hash, "last_scraped": now}},
+            upsert=True
+        )
+        for nct_id, source_hash in source_hashes.items()
+    ]
+    return await db.crawl_index.bulk_write(operations, ordered=False)
+
+
+async def get_crawl_last_modified(query: str) -> Optional[str]:
+    """Get the source Last-Modified header stored for a crawl query."""
+    db = get_db()
+    doc = await db.crawl_queries.find_one({"query": query}, {"last_modified": 1, "_id": 0})
+    return doc.get("last_modified") if doc else None
+
+
+async def set_crawl_last_modified(query: str, last_modified: Optional[str]) -> None:
+    """
+    Store the source Last-Modified header for a crawl query.
+    
+    Args:
+        query: Crawl query key (condition, page budget and enrich flag)
+        last_modified: Header value, or None to forget it
+    """
+    db = get_db()
+    
+    await db.crawl_queries.update_one(
+        {"query": query},
+        {"$set": {"last_modified": last_modified, "last_crawled": datetime.utcnow()}},
+        upsert=True
+    )
+
+
 async def clear_crawl_index() -> int:
-    """Clear all crawl index records. Returns count of deleted records."""
+    """Clear all crawl index records and stored Last-Modified values. Returns count of deleted records."""
     db = get_db()
     result = await db.crawl_index.delete_many({})
+    await db.crawl_queries.delete_many({})
     return result.deleted_count
 
 
@@ -301,6 +576,24 @@ async def update_patient(patient_id: str, updates: Dict[str, Any]) -> Any:
     return result
 
 
+async def update_patient_return_new(patient_id: str, updates: Dict[str, Any]) -> Optional[Dict]:
+    """
+    Update a patient and return the updated document in one round-trip.
+    
+    Returns:
+        The patient document after the update, or None if no patient matched
+    """
+    db = get_db()
+    
+    updates["updated_at"] = datetime.utcnow()
+    
+    return await db.patients.find_one_and_update(
+        {"_id": ObjectId(patient_id)},
+        {"$set": updates},
+        return_document=ReturnDocument.AFTER
+    )
+
+
 async def delete_patient(patient_id: str) -> Any:
     """Delete a patient."""
     db = get_db()
@@ -326,41 +619,47 @@ async def save_matches(patient_id: str, matches: List[Dict[str, Any]]) -> Any:
     """
     db = get_db()
     pid = ObjectId(patient_id)
-    docs = []
-    for m in matches:
-        docs.append({
+    now = datetime.utcnow()
+    
+    docs = [
+        {
             "patient_id": pid,
             "nct_id": m.get("nct_id", ""),
             "trial_title": m.get("trial_title"),
             "match_score": int(m.get("match_score", 0)),
             "reasoning": m.get("reasoning"),
             "status": "pending",
-            "created_at": datetime.utcnow(),
-        })
+            "created_at": now,
+        }
+        for m in matches
+    ]
     if not docs:
         return None
     
-    # Insert into matches collection (history)
-    result = await db.matches.insert_many(docs)
-    
     # Cache top 3 matches on the patient document
-    cached_matches = []
-    for m in matches[:3]:
-        cached_matches.append({
+    cached_matches = [
+        {
             "nct_id": m.get("nct_id", ""),
             "trial_title": m.get("trial_title"),
             "match_score": int(m.get("match_score", 0)),
             "reasoning": m.get("reasoning"),
-        })
-    
-    await db.patients.update_one(
-        {"_id": pid},
-        {
-            "$set": {
-                "cached_matches": cached_matches,
-                "matches_updated_at": datetime.utcnow(),
-            }
         }
+        for m in matches[:3]
+    ]
+    
+    # History insert and patient cache update hit different collections;
+    # issue both at once so the caller waits one round-trip instead of two
+    result, _ = await asyncio.gather(
+        db.matches.insert_many(docs, ordered=False),
+        db.patients.update_one(
+            {"_id": pid},
+            {
+                "$set": {
+                    "cached_matches": cached_matches,
+                    "matches_updated_at": now,
+                }
+            }
+        )
     )
     
     return result
@@ -6,9 +6,11 @@ Usage:
     python run.py
     
 Or with uvicorn directly:
-    uvicorn app.main:app --reload --port 8000
+    uvicorn app.main:app --reload --port 8000 --loop uvloop --http httptools
 """
 
+import os
+import sys
 import uvicorn
 from dotenv import load_dotenv
 
@@ -19,9 +21,27 @@ from app.config import get_settings
 if __name__ == "__main__":
     settings = get_settings()
     
+    # Reload only works with a single process
+    workers = 1 if settings.debug else (settings.workers or os.cpu_count() or 1)
+    
+    # Every worker process opens its own MongoDB pool; split the configured
+    # sizes so the deployment as a whole stays within them
+    if workers > 1:
+        from app.services.mongodb import DEFAULT_MAX_POOL_SIZE
+        
+        max_pool = max(1, (settings.mongodb_max_pool_size or DEFAULT_MAX_POOL_SIZE) // workers)
+        min_pool = min(settings.mongodb_min_pool_size // workers, max_pool)
+        os.environ["MONGODB_MAX_POOL_SIZE"] = str(max_pool)
+        os.environ["MONGODB_MIN_POOL_SIZE"] = str(min_pool)
+    
     uvicorn.run(
         "app.main:app",
         host="0.0.0.0",
         port=settings.port,
-        reload=settings.debug
+        reload=settings.debug,
+        workers=workers,
+        loop="asyncio" if sys.platform == "win32" else "uvloop",  # uvloop has no Windows build
+        http="httptools",
+        backlog=2048,
+        timeout_keep_alive=75  # Outlive typical proxy/load-balancer idle timeouts
     )
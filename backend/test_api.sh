@@ -71,6 +71,37 @@ curl -s "$BASE_URL/api/db-stats" | python3 -m json.tool
 echo ""
 echo ""
 
+# 9. Legacy flat location without a comma lands in location_details.city
+echo "9. POST /api/patients/import (legacy location \"Boston\", no state)"
+curl -s -X POST "$BASE_URL/api/patients/import" \
+  -H "Content-Type: application/json" \
+  -d '{
+    "name": "Legacy Location Patient",
+    "condition": "multiple sclerosis",
+    "location": "Boston"
+  }' | python3 -c '
+import json, sys
+details = json.load(sys.stdin)["patient"]["location_details"]
+ok = details["city"] == "Boston" and details["state"] is None
+print(("✅" if ok else "❌"), "location_details =", details)
+'
+echo ""
+echo ""
+
+# 10. Integral float ages are stored as ints, same as full pydantic validation
+echo "10. POST /api/patients (age 5.0 is stored as int 5)"
+PATIENT_ID=$(curl -s -X POST "$BASE_URL/api/patients" \
+  -H "Content-Type: application/json" \
+  -d '{"name": "Float Age Patient", "condition": "multiple sclerosis", "age": 5.0}' \
+  | python3 -c 'import json, sys; print(json.load(sys.stdin)["patient_id"])')
+curl -s "$BASE_URL/api/patients/$PATIENT_ID" | python3 -c '
+import json, sys
+age = json.load(sys.stdin)["patient"]["age"]
+print(("✅" if type(age) is int and age == 5 else "❌"), "stored age =", repr(age))
+'
+echo ""
+echo ""
+
 echo "════════════════════════════════════════════"
 echo "  Done. Check output above for errors."
 echo "  Full API docs: $BASE_URL/docs"
@@ -316,7 +316,7 @@ export default function NewPatientPage() {
         data_source: "manual",
       };
 
-      const res = await fetch(`${BACKEND_URL}/api/patients`, {
+      const res = await fetch(`${BACKEND_URL}/api/patients/import`, {
         method: "POST",
         headers: { "Content-Type": "application/json" },
         body: JSON.stringify(payload),